@@ -1,29 +1,430 @@
-from flask import Flask, jsonify, request, render_template_string, render_template
+from flask import Flask, Response, g, has_request_context, jsonify, request, render_template, stream_with_context
 from flask_cors import CORS
+from werkzeug.http import parse_etags
+from werkzeug.routing import BaseConverter
+from flask_caching import Cache
+from flask_compress import Compress
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from pybreaker import CircuitBreaker, CircuitBreakerError
+from bson import ObjectId
+from neo4j import READ_ACCESS
 from database.mongodb_client import MongoDBClient
 from database.neo4j_client import Neo4jClient
+from json_provider import OrjsonProvider, dumps_bytes
+from singleflight import SingleFlight
+from stats_version import CACHE_KEY_PREFIX, STATS_VERSION_KEY, new_stats_version
+from tasks import celery, compute_neighborhood
+from schemas import (AdaptiveThresholdArgs, NeighborhoodArgs, NeighborsArgs,
+                     PredictionsArgs, ProteinBatchBody, ProteinIdsArgs, SearchArgs,
+                     validate_args, validate_json)
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+import base64
+import hashlib
+import hmac
 import os
+import re
+import threading
+import time
+
+class ProteinIDConverter(BaseConverter):
+    """
+    Matches UniProt accessions only, so malformed ids are rejected by the
+    router with a 404 before any view or database call runs.
+    """
+    regex = r'(?:[OPQ][0-9][A-Z0-9]{3}[0-9]|[A-NR-Z][0-9](?:[A-Z][A-Z0-9]{2}[0-9]){1,2})'
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+app.url_map.converters['pid'] = ProteinIDConverter
 CORS(app)
 
-# Initialize database clients
-mongo_client = MongoDBClient(
-    uri=os.getenv('MONGO_URI'),
-    db_name=os.getenv('MONGO_DB_NAME', 'protein_db')
+# Compress JSON/HTML bodies (graph and prediction payloads shrink 5-10x);
+# gunicorn does not compress, so there is no double encoding
+app.config.update(
+    COMPRESS_MIMETYPES=['application/json', 'text/html'],
+    COMPRESS_ALGORITHM=['br', 'gzip'],
+    COMPRESS_MIN_SIZE=512
 )
+Compress(app)
 
-neo4j_client = Neo4jClient(
-    uri=os.getenv('NEO4J_URI'),
-    username=os.getenv('NEO4J_USERNAME'),
-    password=os.getenv('NEO4J_PASSWORD')
+# Response cache: Redis when available, in-process otherwise
+cache = Cache(app, config={
+    'CACHE_TYPE': 'RedisCache' if os.getenv('REDIS_HOST') else 'SimpleCache',
+    'CACHE_DEFAULT_TIMEOUT': 60,
+    'CACHE_REDIS_HOST': os.getenv('REDIS_HOST'),
+    'CACHE_REDIS_PORT': int(os.getenv('REDIS_PORT', 6379)),
+    'CACHE_KEY_PREFIX': CACHE_KEY_PREFIX
+})
+
+# Admission control: per-client rate limits, tighter on expensive endpoints.
+# While Redis is unreachable each process counts in memory, and storage
+# errors never fail a request, so a Redis outage does not take the API down
+limiter = Limiter(
+    get_remote_address,
+    app=app,
+    default_limits=[os.getenv('RATE_LIMIT_DEFAULT', '200/minute')],
+    storage_uri=f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT', 6379)}"
+    if os.getenv('REDIS_HOST') else 'memory://',
+    in_memory_fallback_enabled=True,
+    swallow_errors=True
 )
 
+# Circuit breakers: after fail_max consecutive errors a database is treated as
+# down for reset_timeout seconds, and the endpoints using it answer 503
+# immediately instead of holding a pooled connection until the driver times out
+mongo_breaker = CircuitBreaker(fail_max=5, reset_timeout=30, name='mongodb')
+neo4j_breaker = CircuitBreaker(fail_max=5, reset_timeout=30, name='neo4j')
+
+def _unavailable(breaker):
+    return jsonify({'error': f'{breaker.name} temporarily unavailable'}), 503
+
+class _ViewFailure(Exception):
+    """Carries a view's 5xx response through the breaker, which counts it as a failure."""
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+def _raise_on_server_error(view, *args, **kwargs):
+    # Views catch database errors and return them as (body, 500) tuples
+    response = view(*args, **kwargs)
+    if isinstance(response, tuple) and response[1] >= 500:
+        raise _ViewFailure(response)
+    return response
+
+def guarded(breaker):
+    """
+    Run a view through a database's breaker: its 5xx responses count as
+    failures, and while the breaker is open it answers 503 without running.
+    Apply it below the cache decorators so cached responses are still served.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                return breaker.call(_raise_on_server_error, view, *args, **kwargs)
+            except _ViewFailure as e:
+                return e.response
+            except CircuitBreakerError:
+                return _unavailable(breaker)
+        return wrapper
+    return decorator
+
+def _is_success(response):
+    """Only cache successful responses (errors are returned as (body, status) tuples)."""
+    return not isinstance(response, tuple)
+
+# Database clients
+#
+# Clients are created lazily and keyed by pid: pymongo and Neo4j pools are not
+# fork-safe, so with gunicorn's preload_app each worker must build its own
+# pools after the fork instead of inheriting sockets from the master.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 100))
+DB_MIN_POOL_SIZE = min(int(os.getenv('DB_MIN_POOL_SIZE', 10)), DB_POOL_SIZE)
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _create_mongo():
+    client = MongoDBClient(
+        uri=os.getenv('MONGO_URI'),
+        db_name=os.getenv('MONGO_DB_NAME', 'protein_db'),
+        max_pool_size=DB_POOL_SIZE,
+        minPoolSize=DB_MIN_POOL_SIZE,
+        # A saturated pool fails the request after DB_POOL_TIMEOUT instead of
+        # queueing it indefinitely; the circuit breakers see those failures
+        waitQueueTimeoutMS=int(DB_POOL_TIMEOUT * 1000),
+        serverSelectionTimeoutMS=int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 3000)),
+        socketTimeoutMS=int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 30000))
+    )
+    
+    # Full-text search and the prediction join need their indexes; the app
+    # still starts if MongoDB is not ready
+    try:
+        client.create_text_index()
+        client.create_prediction_index()
+    except Exception as e:
+        print(f"Could not create MongoDB indexes: {e}")
+    
+    return client
+
+def _create_neo4j():
+    client = Neo4jClient(
+        uri=os.getenv('NEO4J_URI'),
+        username=os.getenv('NEO4J_USERNAME'),
+        password=os.getenv('NEO4J_PASSWORD'),
+        fetch_size=int(os.getenv('NEO4J_FETCH_SIZE', 1000)),
+        database=os.getenv('NEO4J_DATABASE', 'neo4j'),
+        max_pool_size=DB_POOL_SIZE,
+        connection_acquisition_timeout=DB_POOL_TIMEOUT,
+        max_transaction_retry_time=15,
+        max_connection_lifetime=3600,
+        keep_alive=True
+    )
+    
+    # Protein search needs its full-text index; the app still starts if Neo4j is not ready
+    try:
+        client.create_search_index()
+    except Exception as e:
+        print(f"Could not create Neo4j search index: {e}")
+    
+    return client
+
+def _get_client(name, factory):
+    key = (name, os.getpid())
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = factory()
+                _clients[key] = client
+    return client
+
+def get_mongo() -> MongoDBClient:
+    """Return this process's MongoDB client, creating it on first use."""
+    return _get_client('mongodb', _create_mongo)
+
+def get_neo4j() -> Neo4jClient:
+    """Return this process's Neo4j client, creating it on first use."""
+    return _get_client('neo4j', _create_neo4j)
+
+def neo4j_session():
+    """
+    Read session shared by the Neo4j calls of the current request.
+
+    Opened on first use and closed at teardown. Sessions are not thread-safe,
+    so work fanned out to EXECUTOR keeps opening its own.
+    """
+    if 'neo4j_session' not in g:
+        g.neo4j_session = get_neo4j().session(default_access_mode=READ_ACCESS)
+    return g.neo4j_session
+
+@app.teardown_appcontext
+def close_neo4j_session(exception):
+    session = g.pop('neo4j_session', None)
+    if session is not None:
+        session.close()
+
+# Graph reads are deterministic for a given protein and parameters; entries
+# live until they expire or POST /api/cache/clear after a rebuild
+GRAPH_CACHE_TIMEOUT = int(os.getenv('GRAPH_CACHE_TIMEOUT', 300))
+
+# Concurrent cache misses for the same expensive query share one database call
+singleflight = SingleFlight()
+
+# Statistics move on the scale of data loads, not requests: both the
+# standalone endpoints and the overview read these memoized results
+STATS_TIMEOUT = 300
+
+def _raise_on_error(stats):
+    # The clients report some failures as {'error': ...} instead of raising;
+    # raise them so they are not memoized and the overview sees the failure
+    if 'error' in stats:
+        raise RuntimeError(stats['error'])
+    return stats
+
+# The memoized results are keyed on the statistics version, so publishing a
+# new one (see stats_version.py) makes every process recompute them
+@cache.memoize(timeout=STATS_TIMEOUT)
+def _mongo_statistics(version):
+    return mongo_breaker.call(
+        lambda: _raise_on_error(singleflight.do('stats:mongodb', get_mongo().get_statistics))
+    )
+
+@cache.memoize(timeout=STATS_TIMEOUT)
+def _neo4j_statistics(version):
+    return neo4j_breaker.call(
+        lambda: _raise_on_error(singleflight.do('stats:neo4j', get_neo4j().get_graph_statistics))
+    )
+
+def _stats_version():
+    """
+    Current statistics version, read once per request so the body and the
+    ETag of a response always agree.
+    """
+    if has_request_context() and 'stats_version' in g:
+        return g.stats_version
+    try:
+        cache.add(STATS_VERSION_KEY, new_stats_version(), timeout=0)
+        version = cache.get(STATS_VERSION_KEY)
+    except Exception as e:
+        # Without the cache there is no shared version: statistics are
+        # recomputed and their ETags fall back to hashing the body
+        app.logger.warning(f"Could not read the statistics version: {e}")
+        version = None
+    if has_request_context():
+        g.stats_version = version
+    return version
+
+# Admin-only operations (cache bypass and clearing) require this token in
+# the X-Admin-Token header; they are disabled while it is unset
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+def _is_admin():
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+def _nocache():
+    """Admin bypass: ?nocache=1 recomputes statistics instead of reading the cache."""
+    return has_request_context() and request.args.get('nocache') == '1' and _is_admin()
+
+def _refresh_statistics(*functions):
+    # The Mongo summary is materialized in the stats collection: recompute it too
+    if _mongo_statistics in functions:
+        get_mongo().refresh_statistics()
+    # A new version skips the memoized results and renews the validators of
+    # clients holding a stats ETag
+    version = new_stats_version()
+    try:
+        cache.set(STATS_VERSION_KEY, version, timeout=0)
+    except Exception as e:
+        app.logger.warning(f"Could not publish the statistics version: {e}")
+    g.stats_version = version
+
+# Shared pool for fanning out independent database calls within a request
+EXECUTOR = ThreadPoolExecutor(max_workers=8)
+OVERVIEW_TIMEOUT = float(os.getenv('OVERVIEW_TIMEOUT', '10'))
+
+# Connection checks are cached briefly so probes and dashboards polling
+# /health do not ping both databases on every hit
+HEALTH_CACHE_TTL = float(os.getenv('HEALTH_CACHE_TTL', '2.0'))
+_health_cache = {}
+_health_locks = {'mongodb': threading.Lock(), 'neo4j': threading.Lock()}
+
+def _cached_check(name, check):
+    """
+    Return the result of a connection check, reusing it for HEALTH_CACHE_TTL seconds.
+    Only one caller per window actually hits the driver.
+    """
+    cached = _health_cache.get(name)
+    if cached and time.monotonic() - cached[1] < HEALTH_CACHE_TTL:
+        return cached[0]
+    
+    with _health_locks[name]:
+        cached = _health_cache.get(name)
+        if cached and time.monotonic() - cached[1] < HEALTH_CACHE_TTL:
+            return cached[0]
+        
+        ok = check()
+        _health_cache[name] = (ok, time.monotonic())
+        return ok
+
+def cached_mongo_ok():
+    return _cached_check('mongodb', lambda: get_mongo().check_connection())
+
+def cached_neo4j_ok():
+    return _cached_check('neo4j', lambda: get_neo4j().check_connection())
+
+# The homepage template has no Jinja expressions, so it is rendered once and
+# the encoded bytes are served on every hit
+_index_html = None
+
+# Streaming helpers: large list payloads are written to the socket as records
+# arrive from the database instead of being materialized and encoded at once
+
+def _encode_cursor(object_id):
+    """Opaque pagination cursor: base64 of the last returned _id."""
+    return base64.urlsafe_b64encode(str(object_id).encode()).decode()
+
+def _decode_cursor(cursor):
+    return ObjectId(base64.urlsafe_b64decode(cursor.encode()).decode())
+
+def _json_members(fields):
+    """Encode a dict as bare JSON object members (without the surrounding braces)."""
+    return dumps_bytes(fields)[1:-1]
+
+def _stream_predictions(cursor, total, limit):
+    # The cursor fetches limit + 1 documents: the extra one only tells us
+    # whether another page exists
+    try:
+        yield b'{"predictions":['
+        count = 0
+        last_id = None
+        has_more = False
+        for pred in cursor:
+            if count == limit:
+                has_more = True
+                break
+            last_id = pred['_id']
+            yield (b',' if count else b'') + dumps_bytes(pred)
+            count += 1
+        yield b'],' + _json_members({
+            'count': count,
+            'total': total,
+            'limit': limit,
+            'next_cursor': _encode_cursor(last_id) if has_more else None
+        }) + b'}'
+    finally:
+        # Also runs when the server closes the response because the client
+        # hung up: kill the server-side cursor instead of leaving it open
+        cursor.close()
+
+def _tee_to_cache(key, chunks):
+    # Pass chunks through to the client and cache the full body once the
+    # stream completes; an aborted stream caches nothing
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(body), timeout=GRAPH_CACHE_TIMEOUT)
+
+def _stream_neighborhood_ndjson(center_id, center, events):
+    # One {"node": ...} or {"edge": ...} object per line, in discovery order,
+    # then a {"summary": ...} line; nothing is buffered on the server
+    try:
+        yield b'{"node":' + dumps_bytes(center) + b'}\n'
+        counts = {'node': 1, 'edge': 0}
+        for kind, item in events:
+            yield b'{"' + kind.encode() + b'":' + dumps_bytes(item) + b'}\n'
+            counts[kind] += 1
+        yield dumps_bytes({'summary': {
+            'center_id': center_id,
+            'node_count': counts['node'],
+            'edge_count': counts['edge']
+        }}) + b'\n'
+    finally:
+        events.close()
+
+def _stream_neighborhood(center_id, center, events):
+    # Nodes are streamed as they are discovered; edges are small and buffered
+    try:
+        yield b'{"nodes":[' + dumps_bytes(center)
+        node_count = 1
+        edges = []
+        for kind, item in events:
+            if kind == 'node':
+                yield b',' + dumps_bytes(item)
+                node_count += 1
+            else:
+                edges.append(item)
+        yield b'],"edges":' + dumps_bytes(edges) + b',' + _json_members({
+            'center_id': center_id,
+            'node_count': node_count,
+            'edge_count': len(edges)
+        }) + b'}'
+    finally:
+        # On client disconnect this stops the traversal between queries and
+        # exits the Neo4j session, returning its connection to the pool
+        events.close()
+
 @app.route('/')
 def index():
-    return render_template('index.html') # Homepage
+    global _index_html
+    if _index_html is None:
+        _index_html = render_template('index.html').encode('utf-8')
+    return Response(_index_html, mimetype='text/html') # Homepage
+
+# /health only has four possible bodies, so they are encoded once up front
+_HEALTH_BODIES = {
+    (mongodb, neo4j): dumps_bytes({'status': 'running', 'mongodb': mongodb, 'neo4j': neo4j})
+    for mongodb in (True, False)
+    for neo4j in (True, False)
+}
 
 @app.route('/health')
+@limiter.exempt
 def health():
     """
     Health check endpoint - verifies database connections.
@@ -31,24 +432,22 @@ def health():
     Returns:
         JSON with connection status for MongoDB and Neo4j
     """
-    return jsonify({
-        'status': 'running',
-        'mongodb': mongo_client.check_connection(),
-        'neo4j': neo4j_client.check_connection()
-    })
+    body = _HEALTH_BODIES[bool(cached_mongo_ok()), bool(cached_neo4j_ok())]
+    return Response(body, mimetype='application/json')
 
 # MongoDB
 
 @app.route('/api/mongodb/search')
+@limiter.limit('60/minute')
+@cache.cached(timeout=60, query_string=True, response_filter=_is_success)
+@validate_args(SearchArgs)
+@guarded(mongo_breaker)
 def mongodb_search():
-    query_term = request.args.get('q', '')
-    limit = int(request.args.get('limit', 50))
-    
-    if not query_term:
-        return jsonify({'error': 'Query parameter q is required'}), 400
+    query_term = g.args.q
+    limit = g.args.limit
     
     try:
-        proteins = mongo_client.search_proteins(query_term, limit=limit)
+        proteins = get_mongo().search_proteins(query_term, limit=limit)
         
         return jsonify({
             'query': query_term,
@@ -59,34 +458,94 @@ def mongodb_search():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/mongodb/protein/<protein_id>')
+@app.route('/api/mongodb/protein/<pid:protein_id>')
+@guarded(mongo_breaker)
 def mongodb_get_protein(protein_id):
     try:
-        protein = mongo_client.find_protein({'identifier': protein_id})
+        protein = get_mongo().find_protein({'identifier': protein_id})
         
         if protein:
-            # Convert ObjectId to string
-            protein['_id'] = str(protein['_id'])
             return jsonify(protein)
         else:
             return jsonify({'error': 'Protein not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/mongodb/protein/<pid:protein_id>/full')
+@cache.cached(timeout=GRAPH_CACHE_TIMEOUT, response_filter=_is_success)
+@guarded(mongo_breaker)
+def mongodb_get_protein_full(protein_id):
+    """
+    Protein with its prediction joined in ($lookup), for the detail view.
+    """
+    try:
+        protein = get_mongo().find_protein_with_prediction(protein_id)
+        
+        if protein:
+            return jsonify(protein)
+        else:
+            return jsonify({'error': 'Protein not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/mongodb/protein/<pid:protein_id>/sequence')
+@cache.cached(timeout=GRAPH_CACHE_TIMEOUT, response_filter=_is_success)
+@guarded(mongo_breaker)
+def mongodb_get_sequence(protein_id):
+    """
+    Amino acid sequence, left out of the protein document and fetched on demand.
+    """
+    try:
+        sequence = get_mongo().get_sequence(protein_id)
+        
+        if sequence is not None:
+            return jsonify({'identifier': protein_id, 'sequence': sequence})
+        else:
+            return jsonify({'error': 'Protein not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/mongodb/proteins')
+@validate_args(ProteinIdsArgs)
+@guarded(mongo_breaker)
+def mongodb_get_proteins():
+    """
+    Several proteins in one query: /api/mongodb/proteins?ids=P69905,P68871 (max 500).
+    """
+    ids = g.args.ids
+    
+    try:
+        proteins = get_mongo().find_proteins(ids)
+        found = {protein['identifier'] for protein in proteins}
+        
+        return jsonify({
+            'count': len(proteins),
+            'proteins': proteins,
+            'missing': [pid for pid in ids if pid not in found]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/mongodb/statistics')
 def mongodb_statistics():
     try:
-        stats = mongo_client.get_statistics()
+        if _nocache():
+            _refresh_statistics(_mongo_statistics)
+        stats = _mongo_statistics(_stats_version())
         return jsonify(stats)
+    except CircuitBreakerError:
+        return _unavailable(mongo_breaker)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Neo4j
 
-@app.route('/api/neo4j/protein/<protein_id>')
+@app.route('/api/neo4j/protein/<pid:protein_id>')
+@cache.cached(timeout=GRAPH_CACHE_TIMEOUT, response_filter=_is_success)
+@guarded(neo4j_breaker)
 def neo4j_get_protein(protein_id):
     try:
-        protein = neo4j_client.get_protein_node(protein_id)
+        protein = get_neo4j().get_protein_node(protein_id, session=neo4j_session())
         
         if protein:
             return jsonify(protein)
@@ -95,21 +554,45 @@ def neo4j_get_protein(protein_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/neo4j/neighbors/<protein_id>')
-def neo4j_get_neighbors(protein_id):
-    depth = int(request.args.get('depth', 1))
-    min_weight = float(request.args.get('min_weight', 0.0))
-    limit = int(request.args.get('limit', 100))  # Increased default to 100
+@app.route('/api/neo4j/proteins')
+@validate_args(ProteinIdsArgs)
+@guarded(neo4j_breaker)
+def neo4j_get_proteins():
+    """
+    Several protein nodes in one query: /api/neo4j/proteins?ids=P69905,P68871 (max 500).
+    """
+    ids = g.args.ids
     
-    if depth not in [1, 2]:
-        return jsonify({'error': 'Depth must be 1 or 2'}), 400
+    try:
+        nodes = get_neo4j().get_protein_nodes_batch(ids, session=neo4j_session())
+        
+        return jsonify({
+            'count': len(nodes),
+            'proteins': [nodes[pid] for pid in ids if pid in nodes],
+            'missing': [pid for pid in ids if pid not in nodes]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/neo4j/neighbors/<pid:protein_id>')
+@cache.cached(timeout=GRAPH_CACHE_TIMEOUT, query_string=True, response_filter=_is_success)
+@validate_args(NeighborsArgs)
+@guarded(neo4j_breaker)
+def neo4j_get_neighbors(protein_id):
+    depth = g.args.depth
+    min_weight = g.args.min_weight
+    limit = g.args.limit
     
     try:
-        result = neo4j_client.get_neighbors(
+        # Hot proteins are often requested by many clients at once
+        result = singleflight.do(
+            ('neighbors', protein_id, depth, min_weight, limit),
+            get_neo4j().get_neighbors,
             protein_id=protein_id,
             depth=depth,
             min_weight=min_weight,
-            limit=limit
+            limit=limit,
+            session=neo4j_session()
         )
         
         if result:
@@ -119,37 +602,82 @@ def neo4j_get_neighbors(protein_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/neo4j/neighborhood/<protein_id>')
+@app.route('/api/neo4j/neighborhood/<pid:protein_id>')
+@limiter.limit('20/minute')
+@validate_args(NeighborhoodArgs)
 def neo4j_get_neighborhood(protein_id):
-    depth = int(request.args.get('depth', 2))
-    min_weight = float(request.args.get('min_weight', 0.1))
-    limit = int(request.args.get('limit', 500))  # Increased from 100 to 500
+    depth = g.args.depth
+    min_weight = g.args.min_weight
+    limit = g.args.limit
+    
+    # Cached payloads are keyed on the validated parameters, so equivalent
+    # query strings share an entry
+    ndjson = g.args.format == 'ndjson'
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    cache_key = f'neighborhood:{protein_id}:{depth}:{min_weight}:{limit}:{g.args.format}'
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return Response(cached, mimetype=mimetype)
     
     try:
-        result = neo4j_client.get_neighborhood_visualization(
+        events = get_neo4j().iter_neighborhood_visualization(
             protein_id=protein_id,
             depth=depth,
             min_weight=min_weight,
             limit=limit
         )
         
-        if result:
-            return jsonify(result)
-        else:
+        # The center node comes first; none means the protein is not in the graph
+        first = neo4j_breaker.call(next, events, None)
+        if first is None:
             return jsonify({'error': 'Protein not found in graph'}), 404
+    except CircuitBreakerError:
+        return _unavailable(neo4j_breaker)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    return Response(
+        stream_with_context(_tee_to_cache(
+            cache_key,
+            (_stream_neighborhood_ndjson if ndjson else _stream_neighborhood)(protein_id, first[1], events)
+        )),
+        mimetype=mimetype
+    )
+
+@app.route('/api/neo4j/neighborhood/<pid:protein_id>', methods=['POST'])
+@limiter.limit('20/minute')
+@validate_args(NeighborhoodArgs)
+def neo4j_submit_neighborhood(protein_id):
+    """
+    Queue the neighborhood query on the Celery worker and return a job id
+    right away, so large traversals do not hold a web worker.
+    """
+    try:
+        job = compute_neighborhood.delay(
+            protein_id,
+            depth=g.args.depth,
+            min_weight=g.args.min_weight,
+            limit=g.args.limit
+        )
+    except Exception as e:
+        return jsonify({'error': f'Job queue unavailable: {e}'}), 503
+    
+    return jsonify({
+        'job_id': job.id,
+        'status_url': f'/api/jobs/{job.id}'
+    }), 202
 
 @app.route('/api/neo4j/search')
+@limiter.limit('60/minute')
+@cache.cached(timeout=60, query_string=True, response_filter=_is_success)
+@validate_args(SearchArgs)
+@guarded(neo4j_breaker)
 def neo4j_search():
-    query_term = request.args.get('q', '')
-    limit = int(request.args.get('limit', 50))
-    
-    if not query_term:
-        return jsonify({'error': 'Query parameter q is required'}), 400
+    query_term = g.args.q
+    limit = g.args.limit
     
     try:
-        proteins = neo4j_client.search_proteins(query_term, limit=limit)
+        proteins = get_neo4j().search_proteins(query_term, limit=limit, session=neo4j_session())
         
         return jsonify({
             'query': query_term,
@@ -163,42 +691,56 @@ def neo4j_search():
 @app.route('/api/neo4j/statistics')
 def neo4j_statistics():
     try:
-        stats = neo4j_client.get_graph_statistics()
+        if _nocache():
+            _refresh_statistics(_neo4j_statistics)
+        stats = _neo4j_statistics(_stats_version())
         return jsonify(stats)
+    except CircuitBreakerError:
+        return _unavailable(neo4j_breaker)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/neo4j/adaptive-threshold/<protein_id>')
+@app.route('/api/neo4j/adaptive-threshold/<pid:protein_id>')
+@cache.cached(timeout=GRAPH_CACHE_TIMEOUT, query_string=True, response_filter=_is_success)
+@validate_args(AdaptiveThresholdArgs)
+@guarded(neo4j_breaker)
 def neo4j_adaptive_threshold(protein_id):
-    target_neighbors = int(request.args.get('target_neighbors', 10))
+    target_neighbors = g.args.target_neighbors
     
     try:
-        result = neo4j_client.get_adaptive_threshold(
+        result = get_neo4j().get_adaptive_threshold(
             protein_id=protein_id,
-            target_neighbors=target_neighbors
+            target_neighbors=target_neighbors,
+            session=neo4j_session()
         )
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/neo4j/neighbors-adaptive/<protein_id>')
+@app.route('/api/neo4j/neighbors-adaptive/<pid:protein_id>')
+@cache.cached(timeout=GRAPH_CACHE_TIMEOUT, query_string=True, response_filter=_is_success)
+@validate_args(AdaptiveThresholdArgs)
+@guarded(neo4j_breaker)
 def neo4j_get_neighbors_adaptive(protein_id):
-    target_neighbors = int(request.args.get('target_neighbors', 10))
-    depth = int(request.args.get('depth', 1))
+    target_neighbors = g.args.target_neighbors
+    depth = g.args.depth
     
     try:
         # Get adaptive threshold
-        threshold_info = neo4j_client.get_adaptive_threshold(
+        # Both queries run on the request's session
+        threshold_info = get_neo4j().get_adaptive_threshold(
             protein_id=protein_id,
-            target_neighbors=target_neighbors
+            target_neighbors=target_neighbors,
+            session=neo4j_session()
         )
         
         # Get neighbors with that threshold
-        neighbors = neo4j_client.get_neighbors(
+        neighbors = get_neo4j().get_neighbors(
             protein_id=protein_id,
             depth=depth,
             min_weight=threshold_info['recommended_threshold'],
-            limit=target_neighbors * 2  # Allow some overflow
+            limit=target_neighbors * 2,  # Allow some overflow
+            session=neo4j_session()
         )
         
         if neighbors:
@@ -210,36 +752,107 @@ def neo4j_get_neighbors_adaptive(protein_id):
         return jsonify({'error': str(e)}), 500
 
 
-# Statistics
+# Batch
 
-@app.route('/api/statistics/overview')
-def statistics_overview():
+@app.route('/api/proteins/batch', methods=['POST'])
+@validate_json(ProteinBatchBody)
+def proteins_batch():
+    """
+    Fetch many proteins from MongoDB and/or Neo4j in one call.
+    
+    Body: {"ids": [...], "sources": ["mongo", "neo4j"]} (at most 500 ids).
+    Each source is queried once ($in / IN $ids) and both run concurrently.
+    """
+    ids = list(dict.fromkeys(g.body.ids))
+    sources = set(g.body.sources)
+    
     try:
-        mongo_stats = mongo_client.get_statistics()
-        neo4j_stats = neo4j_client.get_graph_statistics()
+        # Each source goes through its database's breaker
+        mongo_future = EXECUTOR.submit(
+            mongo_breaker.call, get_mongo().find_proteins, ids
+        ) if 'mongo' in sources else None
+        neo4j_future = EXECUTOR.submit(
+            neo4j_breaker.call, get_neo4j().get_protein_nodes_batch, ids
+        ) if 'neo4j' in sources else None
+        
+        proteins = {}
+        if mongo_future:
+            for doc in mongo_future.result():
+                proteins.setdefault(doc['identifier'], {})['mongodb'] = doc
+        if neo4j_future:
+            for protein_id, node in neo4j_future.result().items():
+                proteins.setdefault(protein_id, {})['neo4j'] = node
         
         return jsonify({
-            'mongodb': mongo_stats,
-            'neo4j': neo4j_stats,
-            'system': {
-                'status': 'operational',
-                'mongodb_connected': mongo_client.check_connection(),
-                'neo4j_connected': neo4j_client.check_connection()
-            }
+            'proteins': proteins,
+            'requested': len(ids),
+            'found': len(proteins),
+            'missing': [pid for pid in ids if pid not in proteins]
         })
+    except CircuitBreakerError:
+        return _unavailable(mongo_breaker if mongo_breaker.current_state == 'open' else neo4j_breaker)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+# Statistics
+
+@app.route('/api/statistics/overview')
+@cache.cached(
+    timeout=60,
+    key_prefix=lambda: f'view/statistics_overview/{_stats_version()}',
+    response_filter=_is_success,
+    forced_update=_nocache
+)
+def statistics_overview():
+    if _nocache():
+        _refresh_statistics(_mongo_statistics, _neo4j_statistics)
+    
+    # The four calls are independent I/O, so run them concurrently: the
+    # endpoint then costs max() of the calls instead of their sum
+    version = _stats_version()
+    futures = {
+        'mongodb': EXECUTOR.submit(_mongo_statistics, version),
+        'neo4j': EXECUTOR.submit(_neo4j_statistics, version),
+        'mongodb_connected': EXECUTOR.submit(cached_mongo_ok),
+        'neo4j_connected': EXECUTOR.submit(cached_neo4j_ok)
+    }
+    
+    results = {}
+    failed = False
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=OVERVIEW_TIMEOUT)
+        except Exception as e:
+            # A slow or failing database must not take down the other half
+            results[name] = False if name.endswith('_connected') else {'error': str(e)}
+            failed = True
+    
+    payload = {
+        'mongodb': results['mongodb'],
+        'neo4j': results['neo4j'],
+        'system': {
+            'status': 'degraded' if failed else 'operational',
+            'mongodb_connected': results['mongodb_connected'],
+            'neo4j_connected': results['neo4j_connected']
+        }
+    }
+    
+    if failed:
+        return jsonify(payload), 503
+    return jsonify(payload)
+
 # Predictions
 
-@app.route('/api/predictions/<protein_id>')
+@app.route('/api/predictions/<pid:protein_id>')
+@cache.cached(timeout=GRAPH_CACHE_TIMEOUT, query_string=True, response_filter=_is_success)
+@guarded(mongo_breaker)
 def get_prediction(protein_id):
     try:
         # Get prediction from MongoDB predictions collection
-        prediction = mongo_client.db['predictions'].find_one({'protein_id': protein_id})
+        prediction = get_mongo().db['predictions'].find_one({'protein_id': protein_id})
         
         if prediction:
-            prediction['_id'] = str(prediction['_id'])
             return jsonify(prediction)
         else:
             return jsonify({'error': 'No prediction found for this protein'}), 404
@@ -247,26 +860,128 @@ def get_prediction(protein_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/predictions')
+@validate_args(PredictionsArgs)
+@guarded(mongo_breaker)
 def get_predictions():
-    limit = int(request.args.get('limit', 20))
-    skip = int(request.args.get('skip', 0))
+    """
+    Keyset-paginated list of predictions.
+    
+    Pages are ordered by _id; pass the returned next_cursor as ?after= to get
+    the following page. Each page costs O(limit) regardless of its depth.
+    """
+    limit = g.args.limit
+    after = g.args.after
+    
+    query = {}
+    if after:
+        try:
+            query = {'_id': {'$gt': _decode_cursor(after)}}
+        except Exception:
+            return jsonify({'error': 'Invalid cursor'}), 400
     
     try:
-        predictions = list(mongo_client.db['predictions'].find().skip(skip).limit(limit))
+        collection = get_mongo().db['predictions']
         
-        # Convert ObjectId to string
-        for pred in predictions:
-            pred['_id'] = str(pred['_id'])
+        # estimated_document_count reads collection metadata instead of scanning
+        total = cache.get('predictions_total')
+        if total is None:
+            total = collection.estimated_document_count()
+            cache.set('predictions_total', total, timeout=300)
         
-        total = mongo_client.db['predictions'].count_documents({})
+        cursor = collection.find(query).sort('_id', 1).limit(limit + 1).batch_size(200)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    return Response(
+        stream_with_context(_stream_predictions(cursor, total, limit)),
+        mimetype='application/json'
+    )
+
+
+# Jobs
+
+@app.route('/api/jobs/<uuid:job_id>')
+def get_job(job_id):
+    """
+    Poll a background job: PENDING (queued or unknown), STARTED, SUCCESS, FAILURE.
+    """
+    try:
+        job = celery.AsyncResult(str(job_id))
+        payload = {'job_id': str(job_id), 'state': job.state}
         
-        return jsonify({
-            'predictions': predictions,
-            'count': len(predictions),
-            'total': total,
-            'limit': limit,
-            'skip': skip
-        })
+        if job.state == 'SUCCESS':
+            payload['result'] = job.result
+        elif job.state == 'FAILURE':
+            payload['error'] = str(job.result)
+        
+        return jsonify(payload)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Conditional GET
+#
+# Every buffered 200 GET response carries a weak ETag over its body so that
+# repeat clients get a headers-only 304. Statistics endpoints use a data
+# version instead, which lets a matching If-None-Match skip the aggregation
+# entirely; the version is renewed whenever the statistics are refreshed
+# (the ingest scripts, the worker and ?nocache=1) or the cache is cleared.
+
+STATS_ENDPOINTS = {'mongodb_statistics', 'neo4j_statistics', 'statistics_overview'}
+
+def _etag_matches(etag):
+    # flask-compress appends the coding to the validator (W/"abc:br"), so
+    # compare what the client sends back against the uncompressed value
+    header = re.sub(r':(?:br|gzip)"', '"', request.headers.get('If-None-Match', ''))
+    return parse_etags(header).contains_weak(etag)
+
+def _not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def _stats_etag():
+    # None when the version cannot be read (cache down)
+    version = _stats_version()
+    return f'stats-{version}' if version is not None else None
+
+@app.before_request
+def stats_not_modified():
+    if request.method == 'GET' and request.endpoint in STATS_ENDPOINTS and not _nocache():
+        etag = _stats_etag()
+        if etag and _etag_matches(etag):
+            return _not_modified(etag)
+
+@app.after_request
+def add_etag(response):
+    if (request.method != 'GET' or response.status_code != 200
+            or response.is_streamed or response.get_etag()[0]):
+        return response
+    
+    etag = _stats_etag() if request.endpoint in STATS_ENDPOINTS else None
+    if etag is None:
+        etag = hashlib.blake2b(response.get_data(), digest_size=8).hexdigest()
+    
+    if _etag_matches(etag):
+        return _not_modified(etag)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+# Cache
+
+@app.route('/api/cache/clear', methods=['POST'])
+def clear_cache():
+    """
+    Drop every cached response, e.g. after reloading data or rebuilding the graph.
+    Requires the X-Admin-Token header.
+    """
+    if not _is_admin():
+        return jsonify({'error': 'Admin token required'}), 403
+    
+    try:
+        cache.clear()
+        return jsonify({'status': 'cleared'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -277,6 +992,10 @@ def get_predictions():
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
+@app.errorhandler(429)
+def rate_limited(error):
+    return jsonify({'error': f'Rate limit exceeded: {error.description}'}), 429
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
@@ -292,4 +1011,6 @@ if __name__ == '__main__':
     print(f"Neo4j: {os.getenv('NEO4J_URI', 'Not configured')}")
     print("="*60 + "\n")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Development server only; production uses gunicorn:
+    #   gunicorn -c src/gunicorn.conf.py app:app
+    app.run(host='0.0.0.0', port=5000, debug=os.getenv('FLASK_DEBUG') == '1')
\ No newline at end of file
@@ -1,8 +1,19 @@
-import csv
 import os
 import sys
-from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, Tuple
+import pandas as pd
 from database.mongodb_client import MongoDBClient
+from stats_version import bump_stats_version
+
+
+# TSV columns read from UniProt exports; missing ones are treated as empty
+TSV_COLUMNS = ['Entry', 'Entry Name', 'Protein names', 'Organism', 'Sequence', 'EC number', 'InterPro']
+
+# Protein document fields, in the order create_protein_documents builds them
+PROTEIN_FIELDS = ('identifier', 'entry_name', 'name', 'organism', 'ec_numbers',
+                  'interpro_domains', 'is_labeled', 'sequence_length')
 
 
 class ProteinDataLoader:
@@ -27,64 +38,60 @@ class ProteinDataLoader:
             'errors': 0
         }
     
-    def parse_ec_numbers(self, ec_string: str) -> List[str]:
-        if not ec_string or ec_string.strip() == '':
-            return []
-        
-        # Split by semicolon and clean up
-        ec_numbers = [ec.strip() for ec in ec_string.split(';') if ec.strip()]
-        return ec_numbers
-    
-    def parse_interpro_domains(self, interpro_string: str) -> List[str]:
-        if not interpro_string or interpro_string.strip() == '':
-            return []
-        
-        # Split by semicolon and clean up
-        domains = [domain.strip() for domain in interpro_string.split(';') if domain.strip()]
-        return domains
+    def parse_list_column(self, column: pd.Series) -> List[List[str]]:
+        """
+        Split a semicolon-separated column ("1.1.1.1; 2.7.11.1;") into clean lists.
+        """
+        # Normalise separators with vectorized string ops, then one C-level split per row
+        cleaned = column.str.replace(r'\s*(?:;\s*)+', ';', regex=True).str.strip(' ;')
+        return [value.split(';') if value else [] for value in cleaned]
     
-    def create_protein_document(self, row: Dict[str, str]) -> Optional[Dict]:
+    def create_protein_documents(self, chunk: pd.DataFrame) -> Tuple[List[Dict], List[Dict]]:
         """
-        Create a MongoDB document from a TSV row.
+        Create MongoDB documents from a chunk of TSV rows (rows without identifier are skipped).
+        
+        Returns the protein documents and the matching sequence documents,
+        which are stored in a separate collection.
         """
-        try:
-            # Extract fields based on column names
-            identifier = row.get('Entry', '').strip()
-            entry_name = row.get('Entry Name', '').strip()
-            protein_names = row.get('Protein names', '').strip()
-            organism = row.get('Organism', '').strip()
-            sequence = row.get('Sequence', '').strip()
-            ec_string = row.get('EC number', '')
-            interpro_string = row.get('InterPro', '')
-            
-            # Skip if no identifier
-            if not identifier:
-                return None
-            
-            # Parse EC numbers and InterPro domains
-            ec_numbers = self.parse_ec_numbers(ec_string)
-            interpro_domains = self.parse_interpro_domains(interpro_string)
-            
-            # Create the document
-            document = {
-                'identifier': identifier,
-                'entry_name': entry_name,
-                'name': protein_names,
-                'organism': organism,
-                'sequence': sequence,
-                'ec_numbers': ec_numbers,
-                'interpro_domains': interpro_domains,
-                'is_labeled': len(ec_numbers) > 0,
-                'sequence_length': len(sequence) if sequence else 0
-            }
-            
-            return document
-            
-        except Exception as e:
-            print(f"Error creating document: {e}")
-            return None
+        chunk = chunk.reindex(columns=TSV_COLUMNS, fill_value='')
+        
+        # Skip rows without identifier
+        identifiers = chunk['Entry'].str.strip()
+        has_identifier = identifiers != ''
+        self.stats['errors'] += int((~has_identifier).sum())
+        chunk = chunk[has_identifier]
+        
+        sequences = chunk['Sequence'].str.strip()
+        ec_numbers = self.parse_list_column(chunk['EC number'])
+        interpro_domains = self.parse_list_column(chunk['InterPro'])
+        
+        identifiers = identifiers[has_identifier].tolist()
+        sequences = sequences.tolist()
+        
+        # Build the records straight from plain column lists: one dict per row
+        # from a shared key tuple, without DataFrame.to_dict's per-cell boxing
+        columns = (
+            identifiers,
+            chunk['Entry Name'].str.strip().tolist(),
+            chunk['Protein names'].str.strip().tolist(),
+            chunk['Organism'].str.strip().tolist(),
+            ec_numbers,
+            interpro_domains,
+            [len(ecs) > 0 for ecs in ec_numbers],
+            [len(sequence) for sequence in sequences]
+        )
+        documents = [dict(zip(PROTEIN_FIELDS, values)) for values in zip(*columns)]
+        sequence_documents = [
+            {'identifier': identifier, 'sequence': sequence}
+            for identifier, sequence in zip(identifiers, sequences)
+        ]
+        
+        self.stats['with_ec'] += sum(1 for ecs in ec_numbers if ecs)
+        self.stats['with_interpro'] += sum(1 for domains in interpro_domains if domains)
+        
+        return documents, sequence_documents
     
-    def load_tsv_file(self, filepath: str, batch_size: int = 1000) -> None:
+    def load_tsv_file(self, filepath: str, batch_size: int = 10000) -> None:
         """
         Load protein data from a TSV file into MongoDB.
         """
@@ -96,58 +103,56 @@ class ProteinDataLoader:
         print(f"Loading data from: {os.path.basename(filepath)}")
         print(f"{'='*60}\n")
         
-        batch = []
-        
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                # Use DictReader to handle TSV with headers
-                reader = csv.DictReader(f, delimiter='\t')
-                
-                for row in reader:
-                    self.stats['total_processed'] += 1
-                    
-                    # Create MongoDB document
-                    document = self.create_protein_document(row)
-                    
-                    if document:
-                        batch.append(document)
-                        
-                        # Update statistics
-                        if document['ec_numbers']:
-                            self.stats['with_ec'] += 1
-                        if document['interpro_domains']:
-                            self.stats['with_interpro'] += 1
-                        
-                        # Insert batch when it reaches batch_size
-                        if len(batch) >= batch_size:
-                            self._insert_batch(batch)
-                            batch = []
-                            
-                            # Progress update
-                            if self.stats['total_processed'] % 5000 == 0:
-                                print(f"Processed {self.stats['total_processed']} proteins...")
-                    else:
-                        self.stats['errors'] += 1
+            # pandas' C tokenizer parses each chunk; every field is kept as a string
+            reader = pd.read_csv(
+                filepath,
+                sep='\t',
+                chunksize=batch_size,
+                usecols=lambda column: column in TSV_COLUMNS,
+                dtype=str,
+                keep_default_na=False,
+                quoting=3,  # csv.QUOTE_NONE: UniProt fields are never quoted
+                encoding='utf-8'
+            )
+            
+            for chunk in reader:
+                self.stats['total_processed'] += len(chunk)
+                self._insert_batch(*self.create_protein_documents(chunk))
                 
-                # Insert remaining documents
-                if batch:
-                    self._insert_batch(batch)
+                # Progress update (one line per chunk of batch_size rows)
+                print(f"Processed {self.stats['total_processed']} proteins...")
         
         except Exception as e:
             print(f"Error reading file: {e}")
             self.stats['errors'] += 1
     
-    def _insert_batch(self, batch: List[Dict]) -> None:
+    def _insert_batch(self, batch: List[Dict], sequences: List[Dict]) -> None:
         """
-        Insert a batch of documents into MongoDB.
+        Insert a batch of protein documents and their sequences into MongoDB.
         """
         try:
             if batch:
-                result = self.mongo_client.proteins.insert_many(batch, ordered=False)
+                result = self.mongo_client.proteins.insert_many(
+                    batch,
+                    ordered=False,
+                    bypass_document_validation=True
+                )
                 self.stats['total_inserted'] += len(result.inserted_ids)
         except Exception as e:
             print(f"Error inserting batch: {e}")
             self.stats['errors'] += 1
+        
+        try:
+            if sequences:
+                self.mongo_client.sequences.insert_many(
+                    sequences,
+                    ordered=False,
+                    bypass_document_validation=True
+                )
+        except Exception as e:
+            print(f"Error inserting sequences: {e}")
+            self.stats['errors'] += 1
     
     def print_statistics(self) -> None:
         """
@@ -170,6 +175,20 @@ class ProteinDataLoader:
         return f"{(part / total * 100):.2f}"
 
 
+def load_one(filepath: str, mongo_uri: str, mongo_db: str) -> Dict[str, int]:
+    """
+    Load a single TSV file in a worker process and return its statistics.
+    """
+    # Each process needs its own client: connections do not survive a fork
+    mongo_client = MongoDBClient(uri=mongo_uri, db_name=mongo_db, compressors='zstd,zlib')
+    try:
+        loader = ProteinDataLoader(mongo_client)
+        loader.load_tsv_file(filepath)
+        return loader.stats
+    finally:
+        mongo_client.close()
+
+
 def main():
     print("\n" + "="*60)
     print("PROTEIN DATA LOADER - MongoDB Import")
@@ -180,7 +199,8 @@ def main():
     mongo_db = os.getenv('MONGO_DB_NAME', 'protein_db')
     
     print(f"Connecting to MongoDB: {mongo_db}")
-    mongo_client = MongoDBClient(uri=mongo_uri, db_name=mongo_db)
+    # Bulk loads are bound by the wire: compress it (zstd when installed, zlib otherwise)
+    mongo_client = MongoDBClient(uri=mongo_uri, db_name=mongo_db, compressors='zstd,zlib')
     
     if not mongo_client.check_connection():
         print("ERROR: Cannot connect to MongoDB!")
@@ -189,7 +209,7 @@ def main():
     print("✓ MongoDB connection successful\n")
     
     # Check if data already exists
-    existing_count = mongo_client.proteins.count_documents({})
+    existing_count = mongo_client.proteins.estimated_document_count()
     if existing_count > 0:
         print(f"⚠ WARNING: Database already contains {existing_count:,} proteins")
         print("\nOptions:")
@@ -198,12 +218,17 @@ def main():
         print("  3. Continue anyway (may cause duplicate errors)\n")
         
         choice = os.getenv('RELOAD_MODE', '')
+        if not choice and not sys.stdin.isatty():
+            # No one to answer the prompt (pipeline, scheduler, CI)
+            print("ERROR: set RELOAD_MODE (1/2/3) to run without a terminal")
+            sys.exit(2)
         if not choice:
             choice = input("Enter choice (1/2/3): ").strip()
         
         if choice == '1':
             print("\nClearing existing data...")
             mongo_client.proteins.delete_many({})
+            mongo_client.sequences.delete_many({})
             mongo_client.predictions.delete_many({})
             print("✓ Existing data cleared\n")
         elif choice == '2':
@@ -212,19 +237,14 @@ def main():
         else:
             print("\n⚠ Continuing with existing data (may cause errors)...\n")
     
-    # Create indexes for efficient querying
-    print("Creating database indexes...")
+    # Only the unique identifier index is needed while loading (it rejects
+    # duplicates); secondary indexes are built once afterwards, which is much
+    # cheaper than updating them on every insert
     try:
         mongo_client.proteins.create_index('identifier', unique=True)
-        mongo_client.proteins.create_index('entry_name')
-        mongo_client.proteins.create_index('is_labeled')
-        mongo_client.proteins.create_index('ec_numbers')
-        mongo_client.proteins.create_index('interpro_domains')
-        print("✓ Indexes created\n")
+        mongo_client.sequences.create_index('identifier', unique=True)
     except Exception as e:
-        if "IndexKeySpecsConflict" in str(e) or "already exists" in str(e):
-            print("✓ Indexes already exist (skipping)\n")
-        else:
+        if "IndexKeySpecsConflict" not in str(e) and "already exists" not in str(e):
             raise
     
     # Initialize loader
@@ -243,17 +263,56 @@ def main():
         print("Please ensure data files are mounted to /app/data in the container.")
         sys.exit(1)
     
-    # Load each file
-    for tsv_file in tsv_files:
-        filepath = os.path.join(data_dir, tsv_file)
-        loader.load_tsv_file(filepath)
+    # Load each file; files are independent, so several are loaded in parallel
+    filepaths = [os.path.join(data_dir, tsv_file) for tsv_file in tsv_files]
+    max_workers = min(len(filepaths), int(os.getenv('LOADER_WORKERS', os.cpu_count() or 1)))
+    
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for stats in executor.map(load_one, filepaths, repeat(mongo_uri), repeat(mongo_db)):
+                for key, value in stats.items():
+                    loader.stats[key] += value
+    else:
+        for filepath in filepaths:
+            loader.load_tsv_file(filepath)
     
     # Print statistics
     loader.print_statistics()
     
+    # Create indexes for efficient querying
+    print("Creating database indexes...")
+    # Each index is created on its own, so one that already exists (possibly
+    # with other options) does not prevent the others from being built
+    index_builders = [
+        lambda: mongo_client.proteins.create_index('entry_name'),
+        lambda: mongo_client.proteins.create_index('is_labeled'),
+        # Set by label propagation; without it predicted-protein lookups scan
+        lambda: mongo_client.proteins.create_index('is_predicted'),
+        lambda: mongo_client.proteins.create_index('ec_numbers'),
+        lambda: mongo_client.proteins.create_index('interpro_domains'),
+        mongo_client.create_text_index
+    ]
+    for create_index in index_builders:
+        try:
+            create_index()
+        except Exception as e:
+            if "IndexKeySpecsConflict" in str(e) or "already exists" in str(e):
+                print(f"  Index already exists (skipping): {e}")
+            else:
+                raise
+    print("✓ Indexes created\n")
+    
+    # Materialize the summary served by the statistics endpoints
+    print("Refreshing statistics summary...")
+    mongo_client.refresh_statistics()
+    bump_stats_version()
+    print("✓ Statistics summary updated\n")
+    
     # Verify the data
     print("Verifying loaded data...")
-    total_count = mongo_client.proteins.count_documents({})
+    # The total comes from collection metadata; the planner answers the
+    # filtered counts from the is_labeled index without fetching documents
+    total_count = mongo_client.proteins.estimated_document_count()
     labeled_count = mongo_client.proteins.count_documents({'is_labeled': True})
     unlabeled_count = mongo_client.proteins.count_documents({'is_labeled': False})
     
@@ -1,11 +1,30 @@
+from datetime import datetime, timezone
 from pymongo import MongoClient
 from typing import Dict, List, Optional
+import re
+
+# A single alphanumeric token may be the start of a UniProt accession
+ACCESSION_PREFIX = re.compile(r'^[A-Za-z0-9]{2,10}$')
 
 class MongoDBClient:
-    def __init__(self, uri: str, db_name: str):
-        self.client = MongoClient(uri)
+    TEXT_INDEX_NAME = 'protein_text'
+    STATS_COLLECTION = 'stats'
+    STATS_ID = 'protein_summary'
+    
+    def __init__(self, uri: str, db_name: str, max_pool_size: int = 100,
+                 compressors: Optional[str] = None, **client_options):
+        # compressors (e.g. 'zstd,zlib') enables wire compression for bulk
+        # transfers; the server picks the first one it also supports.
+        # client_options go straight to MongoClient (pool and timeout tuning)
+        if compressors:
+            client_options['compressors'] = compressors
+        self.client = MongoClient(uri, maxPoolSize=max_pool_size, **client_options)
         self.db = self.client[db_name]
         self.proteins = self.db['proteins']
+        # Sequences live in their own collection (keyed by identifier) so the
+        # protein documents stay small; fetch them with get_sequence
+        self.sequences = self.db['sequences']
+        self.predictions = self.db['predictions']
     
     def check_connection(self) -> bool:
         try:
@@ -15,81 +34,170 @@ class MongoDBClient:
             print(f"MongoDB connection error: {e}")
             return False
     
+    def create_text_index(self) -> None:
+        """
+        Create the full-text index backing search_proteins (MongoDB allows one per collection).
+        """
+        self.proteins.create_index(
+            [('identifier', 'text'), ('entry_name', 'text'), ('name', 'text')],
+            name=self.TEXT_INDEX_NAME,
+            default_language='none'
+        )
+    
+    def create_prediction_index(self) -> None:
+        """
+        Unique index on predictions.protein_id (used by find_protein_with_prediction).
+        """
+        self.predictions.create_index('protein_id', unique=True)
+    
     def insert_protein(self, protein_data: Dict) -> str:
         result = self.proteins.insert_one(protein_data)
         return str(result.inserted_id)
     
-    def find_protein(self, query: Dict) -> Optional[Dict]:
-        return self.proteins.find_one(query)
+    def find_protein(self, query: Dict, projection: Optional[Dict] = None) -> Optional[Dict]:
+        return self.proteins.find_one(query, projection or {'sequence': 0})
+    
+    def get_sequence(self, identifier: str) -> Optional[str]:
+        """
+        Amino acid sequence of a protein, or None if it is unknown.
+        """
+        document = self.sequences.find_one({'identifier': identifier}, {'_id': 0, 'sequence': 1})
+        if document is None:
+            # Databases loaded before the split still embed the sequence
+            document = self.proteins.find_one({'identifier': identifier}, {'_id': 0, 'sequence': 1})
+        return document.get('sequence') if document else None
+    
+    def find_protein_with_prediction(self, identifier: str) -> Optional[Dict]:
+        """
+        Protein document with its prediction (or None) joined in, in one round-trip.
+        """
+        pipeline = [
+            {'$match': {'identifier': identifier}},
+            {'$limit': 1},
+            {'$project': {'sequence': 0}},
+            {'$lookup': {
+                'from': self.predictions.name,
+                'localField': 'identifier',
+                'foreignField': 'protein_id',
+                'as': 'prediction'
+            }},
+            {'$addFields': {'prediction': {'$arrayElemAt': ['$prediction', 0]}}},
+            {'$project': {'prediction._id': 0}}
+        ]
+        protein = next(self.proteins.aggregate(pipeline), None)
+        if protein is not None:
+            protein.setdefault('prediction', None)
+        return protein
+    
+    def find_proteins(self, identifiers: List[str]) -> List[Dict]:
+        """
+        Fetch several proteins in one round-trip (sequences excluded).
+        """
+        return list(self.proteins.find(
+            {'identifier': {'$in': identifiers}},
+            {'sequence': 0}
+        ))
     
     def search_proteins(self, text: str, limit: int = 50) -> List[Dict]:
-        results = list(self.proteins.find({
-            '$or': [
-                {'identifier': {'$regex': text, '$options': 'i'}},
-                {'entry_name': {'$regex': text, '$options': 'i'}},
-                {'name': {'$regex': text, '$options': 'i'}}
-            ]
-        }).limit(limit))
+        results = []
         
-        # Convert ObjectId to string
-        for protein in results:
-            protein['_id'] = str(protein['_id'])
+        # Accession prefixes ("P699") are not whole words for the text index;
+        # an anchored, case-sensitive regex on identifier uses its B-tree index
+        if ACCESSION_PREFIX.match(text):
+            results = list(self.proteins.find(
+                {'identifier': {'$regex': '^' + re.escape(text.upper())}},
+                {'sequence': 0}
+            ).sort('identifier', 1).limit(limit))
+        
+        # Inverted-index lookup ranked by relevance; sequences are large and
+        # not needed for result lists, so they are projected away
+        if len(results) < limit:
+            query = {'$text': {'$search': text}}
+            if results:
+                query['identifier'] = {'$nin': [protein['identifier'] for protein in results]}
+            results += list(self.proteins.find(
+                query,
+                {'sequence': 0, 'score': {'$meta': 'textScore'}}
+            ).sort([('score', {'$meta': 'textScore'})]).limit(limit - len(results)))
         
         return results
     
     def get_statistics(self) -> Dict:
+        """
+        Read the materialized protein summary (computed on first use if missing).
+        """
         try:
-            total_count = self.proteins.count_documents({})
-            labeled_count = self.proteins.count_documents({'is_labeled': True})
-            unlabeled_count = self.proteins.count_documents({'is_labeled': False})
-            predicted_count = self.proteins.count_documents({'is_predicted': True})
-            
-            # Average sequence length
+            summary = self.db[self.STATS_COLLECTION].find_one({'_id': self.STATS_ID}, {'_id': 0})
+            return summary if summary else self.refresh_statistics()
+        except Exception as e:
+            return {'error': str(e)}
+    
+    def refresh_statistics(self) -> Dict:
+        """
+        Recompute the protein summary and store it in the stats collection.
+        
+        Called after loading data or propagating labels, and periodically by the
+        worker; the full-collection aggregation never runs on the request path.
+        """
+        summary = self.compute_statistics()
+        if 'error' not in summary:
+            summary['updated_at'] = datetime.now(timezone.utc)
+            self.db[self.STATS_COLLECTION].replace_one({'_id': self.STATS_ID}, summary, upsert=True)
+            summary.pop('_id', None)
+        return summary
+    
+    def compute_statistics(self) -> Dict:
+        try:
+            # One $facet pass computes every figure, instead of four counts
+            # and three aggregations each going back to the server
             pipeline = [
-                {'$group': {
-                    '_id': None,
-                    'avg_length': {'$avg': '$sequence_length'}
+                {'$facet': {
+                    'totals': [
+                        {'$group': {
+                            '_id': None,
+                            'total': {'$sum': 1},
+                            'labeled': {'$sum': {'$cond': [{'$eq': ['$is_labeled', True]}, 1, 0]}},
+                            'unlabeled': {'$sum': {'$cond': [{'$eq': ['$is_labeled', False]}, 1, 0]}},
+                            'predicted': {'$sum': {'$cond': [{'$eq': ['$is_predicted', True]}, 1, 0]}},
+                            'avg_length': {'$avg': '$sequence_length'}
+                        }}
+                    ],
+                    # EC number distribution (top 10)
+                    'top_ec_numbers': [
+                        {'$match': {'ec_numbers': {'$ne': []}}},
+                        {'$unwind': '$ec_numbers'},
+                        {'$group': {'_id': '$ec_numbers', 'count': {'$sum': 1}}},
+                        {'$sort': {'count': -1}},
+                        {'$limit': 10}
+                    ],
+                    # InterPro domain distribution (top 10)
+                    'top_domains': [
+                        {'$match': {'interpro_domains': {'$ne': []}}},
+                        {'$unwind': '$interpro_domains'},
+                        {'$group': {'_id': '$interpro_domains', 'count': {'$sum': 1}}},
+                        {'$sort': {'count': -1}},
+                        {'$limit': 10}
+                    ]
                 }}
             ]
-            avg_result = list(self.proteins.aggregate(pipeline))
-            avg_length = avg_result[0]['avg_length'] if avg_result else 0
-            
-            # EC number distribution (top 10)
-            ec_pipeline = [
-                {'$match': {'ec_numbers': {'$ne': []}}},
-                {'$unwind': '$ec_numbers'},
-                {'$group': {
-                    '_id': '$ec_numbers',
-                    'count': {'$sum': 1}
-                }},
-                {'$sort': {'count': -1}},
-                {'$limit': 10}
-            ]
-            ec_distribution = list(self.proteins.aggregate(ec_pipeline))
+            facets = next(self.proteins.aggregate(pipeline))
             
-            # InterPro domain distribution (top 10)
-            domain_pipeline = [
-                {'$match': {'interpro_domains': {'$ne': []}}},
-                {'$unwind': '$interpro_domains'},
-                {'$group': {
-                    '_id': '$interpro_domains',
-                    'count': {'$sum': 1}
-                }},
-                {'$sort': {'count': -1}},
-                {'$limit': 10}
-            ]
-            domain_distribution = list(self.proteins.aggregate(domain_pipeline))
+            totals = facets['totals'][0] if facets['totals'] else {}
+            total_count = totals.get('total', 0)
+            labeled_count = totals.get('labeled', 0)
+            predicted_count = totals.get('predicted', 0)
+            avg_length = totals.get('avg_length') or 0
             
             return {
                 'total_proteins': total_count,
                 'labeled_proteins': labeled_count,
-                'unlabeled_proteins': unlabeled_count,
+                'unlabeled_proteins': totals.get('unlabeled', 0),
                 'predicted_proteins': predicted_count,
                 'labeled_percentage': round((labeled_count / total_count * 100), 2) if total_count > 0 else 0,
                 'predicted_percentage': round((predicted_count / total_count * 100), 2) if total_count > 0 else 0,
                 'average_sequence_length': round(avg_length, 2),
-                'top_ec_numbers': [{'ec_number': item['_id'], 'count': item['count']} for item in ec_distribution],
-                'top_domains': [{'domain': item['_id'], 'count': item['count']} for item in domain_distribution]
+                'top_ec_numbers': [{'ec_number': item['_id'], 'count': item['count']} for item in facets['top_ec_numbers']],
+                'top_domains': [{'domain': item['_id'], 'count': item['count']} for item in facets['top_domains']]
             }
         except Exception as e:
             return {'error': str(e)}
@@ -1,90 +1,431 @@
-from neo4j import GraphDatabase
-from typing import Dict, List, Optional
+from contextlib import nullcontext
+from dataclasses import dataclass
+from neo4j import READ_ACCESS, GraphDatabase, RoutingControl, Session
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+import re
+
+# A single alphanumeric token may be the start of a UniProt accession
+ACCESSION_PREFIX = re.compile(r'^[A-Za-z0-9]{2,10}$')
+
+# Characters with a meaning in Lucene query syntax
+LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+# get_neighbors queries are module constants chosen by depth: the depth is
+# never spliced into the text, so each shape keeps a single cached plan
+NEIGHBORS_QUERY = """
+    MATCH (p:Protein {id: $id})
+    OPTIONAL MATCH (p)-[r:SIMILAR_TO]-(neighbor:Protein)
+    WHERE r.weight >= $min_weight
+    WITH p, neighbor, r
+    ORDER BY r.weight DESC
+    LIMIT $limit
+    RETURN properties(p) AS p, collect({neighbor: properties(neighbor), weight: r.weight}) as neighbors
+"""
+
+# Each neighbor is returned once, at its shortest distance (and best weight
+# there), so deduplication and LIMIT happen server-side
+NEIGHBORS_DEPTH2_QUERY = """
+    MATCH (p:Protein {id: $id})
+    CALL {
+        WITH p
+        CALL {
+            WITH p
+            MATCH (p)-[r:SIMILAR_TO]-(n:Protein)
+            WHERE r.weight >= $min_weight
+            RETURN n AS neighbor, r.weight AS weight, 1 AS distance
+            UNION
+            WITH p
+            MATCH (p)-[r1:SIMILAR_TO]-(:Protein)-[r2:SIMILAR_TO]-(n:Protein)
+            WHERE r1.weight >= $min_weight AND r2.weight >= $min_weight
+              AND n.id <> p.id
+            RETURN n AS neighbor, r2.weight AS weight, 2 AS distance
+        }
+        WITH neighbor, distance, weight
+        ORDER BY distance, weight DESC
+        WITH neighbor, head(collect({distance: distance, weight: weight})) AS best
+        ORDER BY best.distance, best.weight DESC
+        LIMIT $limit
+        RETURN collect({
+            protein: properties(neighbor),
+            weight: best.weight,
+            distance: best.distance
+        }) AS neighbors
+    }
+    RETURN properties(p) AS p, neighbors
+"""
+
+
+def _single(records: List):
+    return records[0] if records else None
+
+
+def _node(record) -> Dict:
+    return record['p']
+
+
+def _fulltext_query(text: str) -> str:
+    """
+    Lucene query matching every word of text as a prefix ("hemo glob" -> "hemo* AND glob*").
+    """
+    terms = [LUCENE_SPECIAL.sub(r'\\\1', term.lower()) + '*' for term in text.split()]
+    return ' AND '.join(terms)
+
+
+@dataclass(slots=True)
+class EdgeRow:
+    """
+    One similarity edge of a neighborhood payload.
+
+    Neighborhoods carry many more edges than nodes, and a slotted instance is
+    about a third the size of the equivalent dict. orjson serializes it as a
+    plain object, so the JSON is unchanged.
+    """
+    source: str
+    target: str
+    weight: float
+
 
 class Neo4jClient:
-    def __init__(self, uri: str, username: str, password: str):
-        self.driver = GraphDatabase.driver(uri, auth=(username, password))
+    SEARCH_INDEX_NAME = 'protein_search'
+    
+    def __init__(self, uri: str, username: str, password: str, fetch_size: int = 1000,
+                 max_pool_size: int = 100, database: str = 'neo4j', **driver_options):
+        # fetch_size bounds how many records the driver buffers per pull, so
+        # large results are streamed from the server as they are consumed;
+        # driver_options go straight to the driver (pool and timeout tuning)
+        self.driver = GraphDatabase.driver(
+            uri,
+            auth=(username, password),
+            fetch_size=fetch_size,
+            max_connection_pool_size=max_pool_size,
+            **driver_options
+        )
+        # Naming the database up front saves the driver a home-database
+        # lookup each time a session is opened
+        self.database = database
+    
+    def session(self, **kwargs) -> Session:
+        """
+        Open a session on the configured database (kwargs go to driver.session).
+        """
+        return self.driver.session(database=self.database, **kwargs)
+    
+    def _read_session(self, session: Optional[Session] = None):
+        """
+        Use the caller's session (e.g. one shared by a whole API request) or open
+        a read session; only sessions opened here are closed on exit.
+        """
+        if session is not None:
+            return nullcontext(session)
+        return self.session(default_access_mode=READ_ACCESS)
+    
+    def _write_session(self, session: Optional[Session] = None):
+        """
+        Use the caller's session (e.g. one shared by a whole graph build) or
+        open a write session; only sessions opened here are closed on exit.
+        """
+        if session is not None:
+            return nullcontext(session)
+        return self.session()
+    
+    def _read(self, session: Session, query: str, map_record: Optional[Callable] = None,
+              **params) -> List:
+        """
+        Run a parameterized read query as a managed read transaction.
+        
+        Query text never varies with the inputs, so Neo4j reuses its cached
+        plan; transient errors are retried by the driver and, on a cluster,
+        reads are routed to followers. Records are fetched inside the transaction.
+        
+        map_record converts each record as it is pulled (fetch_size at a time),
+        so only the converted rows are kept rather than the driver's records.
+        """
+        def work(tx):
+            result = tx.run(query, **params)
+            if map_record is None:
+                return list(result)
+            return [map_record(record) for record in result]
+        
+        return session.execute_read(work)
+    
+    def _write(self, session: Session, query: str, **params) -> None:
+        """
+        Run a parameterized write query as a managed write transaction
+        (retried by the driver on transient errors such as lock timeouts).
+        """
+        session.execute_write(lambda tx: tx.run(query, **params).consume())
+    
+    def ensure_indexes(self, timeout: int = 300) -> None:
+        """
+        Create the schema every query relies on (idempotent).
+        
+        - a uniqueness constraint on Protein.id, whose backing index serves
+          every MATCH (p:Protein {id: ...}) and the MERGE of the bulk loader
+        - a range index on Protein.is_labeled for the labeled/unlabeled counts
+        - a range index on SIMILAR_TO.weight for the weight thresholds
+        - a range index on Protein.degree for the degree statistics, with
+          the degrees backfilled if some proteins lack one
+        - the full-text search index
+        
+        Indexes are populated in the background; this waits (up to timeout
+        seconds) until they are online, so the loads that follow never fall
+        back to label scans.
+        """
+        with self.session() as session:
+            constrained = session.run(
+                "SHOW CONSTRAINTS YIELD name WHERE name = 'protein_id_unique' RETURN count(*) AS n"
+            ).single()['n'] > 0
+            if not constrained:
+                # Graphs built before the constraint may hold duplicate ids (the
+                # "continue" reload option); the constraint cannot be created
+                # then, so keep their plain index instead of losing it
+                duplicate = session.run(
+                    "MATCH (p:Protein) WITH p.id AS id, count(*) AS copies "
+                    "WHERE copies > 1 RETURN id LIMIT 1"
+                ).single()
+                if duplicate is not None:
+                    raise RuntimeError(
+                        f"Duplicate Protein.id values (e.g. {duplicate['id']}): rebuild the "
+                        "graph (RELOAD_MODE=1) before the unique constraint can be created"
+                    )
+                # The plain index on the same property would prevent creating it
+                session.run("DROP INDEX protein_id IF EXISTS").consume()
+                session.run(
+                    "CREATE CONSTRAINT protein_id_unique IF NOT EXISTS "
+                    "FOR (p:Protein) REQUIRE p.id IS UNIQUE"
+                ).consume()
+            session.run(
+                "CREATE INDEX protein_labeled IF NOT EXISTS FOR (p:Protein) ON (p.is_labeled)"
+            ).consume()
+            session.run(
+                "CREATE INDEX similarity_weight IF NOT EXISTS FOR ()-[r:SIMILAR_TO]-() ON (r.weight)"
+            ).consume()
+            session.run(
+                "CREATE INDEX protein_degree IF NOT EXISTS FOR (p:Protein) ON (p.degree)"
+            ).consume()
+        self.create_search_index()
+        with self.session() as session:
+            session.run("CALL db.awaitIndexes($timeout)", timeout=timeout).consume()
+            # The degree statistics read p.degree through its index; backfill it
+            # once on graphs loaded before update_degrees existed (or cut short).
+            # The total comes from the count store, the degree count from the index
+            record = session.run(
+                "CALL { MATCH (p:Protein) RETURN count(p) AS total } "
+                "CALL { MATCH (p:Protein) WHERE p.degree IS NOT NULL RETURN count(p) AS with_degree } "
+                "RETURN total, with_degree"
+            ).single()
+        if record['with_degree'] < record['total']:
+            self.update_degrees()
+    
+    def create_search_index(self) -> None:
+        """
+        Create the full-text index backing search_proteins.
+        """
+        with self.session() as session:
+            session.run(
+                f"CREATE FULLTEXT INDEX {self.SEARCH_INDEX_NAME} IF NOT EXISTS "
+                "FOR (p:Protein) ON EACH [p.id, p.name, p.entry_name]"
+            ).consume()
     
     def check_connection(self) -> bool:
         try:
-            with self.driver.session() as session:
-                result = session.run("RETURN 1")
-                return result.single()[0] == 1
+            # execute_query borrows a pooled connection without a session of our own
+            records, _, _ = self.driver.execute_query(
+                "RETURN 1",
+                database_=self.database,
+                routing_=RoutingControl.READ
+            )
+            return records[0][0] == 1
         except Exception as e:
             print(f"Neo4j connection error: {e}")
             return False
     
     def create_protein_node(self, protein_id: str, properties: Dict):
-        with self.driver.session() as session:
-            session.run(
-                "CREATE (p:Protein {id: $id}) SET p += $properties",
-                id=protein_id,
-                properties=properties
-            )
+        self.create_protein_nodes([{**properties, 'id': protein_id}])
+    
+    def create_protein_nodes(self, rows: List[Dict], batch_size: int = 10000,
+                             session: Optional[Session] = None) -> Dict[str, int]:
+        """
+        Create or update one Protein node per row (a dict of node properties,
+        including id), batch_size rows per UNWIND transaction.
+        
+        MERGE on the indexed id makes re-running a load idempotent. Returns
+        the internal node id of each protein, for creating its edges by id
+        (valid until the node is deleted).
+        """
+        node_ids = {}
+        with self._write_session(session) as session:
+            for start in range(0, len(rows), batch_size):
+                node_ids.update(session.execute_write(
+                    lambda tx, batch: dict(tx.run(
+                        """
+                        UNWIND $rows AS row
+                        MERGE (p:Protein {id: row.id}) SET p += row
+                        RETURN row.id AS id, id(p) AS node_id
+                        """,
+                        rows=batch
+                    ).values()),
+                    rows[start:start + batch_size]
+                ))
+        return node_ids
     
     def create_similarity_relationship(self, protein1_id: str, protein2_id: str, weight: float):
-        with self.driver.session() as session:
+        self.create_similarity_relationships([(protein1_id, protein2_id, weight)])
+    
+    def create_similarity_relationships(self, pairs: List[Tuple[Union[str, int], Union[str, int], float]],
+                                        batch_size: int = 10000,
+                                        session: Optional[Session] = None,
+                                        by_node_id: bool = False) -> None:
+        """
+        Create SIMILAR_TO edges from (id1, id2, weight) tuples (see
+        create_similarity_columns).
+        """
+        ids1, ids2, weights = (list(column) for column in zip(*pairs)) if pairs else ([], [], [])
+        self.create_similarity_columns(ids1, ids2, weights, batch_size, session, by_node_id)
+    
+    def create_similarity_columns(self, ids1: List[Union[str, int]], ids2: List[Union[str, int]],
+                                  weights: List[float], batch_size: int = 10000,
+                                  session: Optional[Session] = None,
+                                  by_node_id: bool = False) -> None:
+        """
+        Create SIMILAR_TO edges ids1[k] -> ids2[k] with weights[k], batch_size
+        edges per UNWIND query.
+        
+        The edges are sent as three flat lists rather than one list per edge,
+        which is smaller on the wire and cheaper to build. With by_node_id,
+        the endpoints are internal node ids (as returned by
+        create_protein_nodes) and are fetched directly by id; otherwise they
+        are protein ids matched through the Protein.id constraint created by
+        ensure_indexes.
+        """
+        if by_node_id:
+            query = """
+                UNWIND range(0, size($ids1) - 1) AS k
+                MATCH (p1) WHERE id(p1) = $ids1[k]
+                MATCH (p2) WHERE id(p2) = $ids2[k]
+                CREATE (p1)-[:SIMILAR_TO {weight: $weights[k]}]->(p2)
+                """
+        else:
+            query = """
+                UNWIND range(0, size($ids1) - 1) AS k
+                MATCH (p1:Protein {id: $ids1[k]})
+                MATCH (p2:Protein {id: $ids2[k]})
+                CREATE (p1)-[:SIMILAR_TO {weight: $weights[k]}]->(p2)
+                """
+        with self._write_session(session) as session:
+            for start in range(0, len(weights), batch_size):
+                end = start + batch_size
+                self._write(session, query, ids1=ids1[start:end], ids2=ids2[start:end],
+                            weights=weights[start:end])
+    
+    def load_graph_csv(self, nodes_url: str, edges_url: str, batch_size: int = 10000) -> None:
+        """
+        Load Protein nodes and SIMILAR_TO edges from the import files written by
+        the graph builder's export mode, batch_size rows per transaction.
+        
+        The server reads the files itself with LOAD CSV (e.g. file:///nodes.csv
+        from its import directory), so no rows travel through the driver.
+        Nodes are merged on id; edges are created, so load them into a graph
+        that has none yet.
+        """
+        with self.session() as session:
+            # CALL ... IN TRANSACTIONS needs an auto-commit transaction
             session.run(
                 """
-                MATCH (p1:Protein {id: $id1})
-                MATCH (p2:Protein {id: $id2})
-                CREATE (p1)-[:SIMILAR_TO {weight: $weight}]->(p2)
+                LOAD CSV WITH HEADERS FROM $url AS row
+                CALL {
+                    WITH row
+                    MERGE (p:Protein {id: row['id:ID']})
+                    SET p.entry_name = coalesce(row.entry_name, ''),
+                        p.name = coalesce(row.name, ''),
+                        p.organism = coalesce(row.organism, ''),
+                        p.is_labeled = row['is_labeled:boolean'] = 'true',
+                        p.ec_numbers = CASE WHEN row['ec_numbers:string[]'] IS NULL THEN []
+                                       ELSE split(row['ec_numbers:string[]'], ';') END,
+                        p.interpro_domains = CASE WHEN row['interpro_domains:string[]'] IS NULL THEN []
+                                             ELSE split(row['interpro_domains:string[]'], ';') END,
+                        p.sequence_length = toInteger(row['sequence_length:int'])
+                } IN TRANSACTIONS OF $batch_size ROWS
                 """,
-                id1=protein1_id,
-                id2=protein2_id,
-                weight=weight
-            )
+                url=nodes_url,
+                batch_size=batch_size
+            ).consume()
+            session.run(
+                """
+                LOAD CSV WITH HEADERS FROM $url AS row
+                CALL {
+                    WITH row
+                    MATCH (p1:Protein {id: row[':START_ID']})
+                    MATCH (p2:Protein {id: row[':END_ID']})
+                    CREATE (p1)-[:SIMILAR_TO {weight: toFloat(row['weight:double'])}]->(p2)
+                } IN TRANSACTIONS OF $batch_size ROWS
+                """,
+                url=edges_url,
+                batch_size=batch_size
+            ).consume()
     
-    def get_protein_node(self, protein_id: str) -> Optional[Dict]:
-        with self.driver.session() as session:
-            result = session.run(
-                "MATCH (p:Protein {id: $id}) RETURN p",
+    def update_degrees(self, batch_size: int = 10000) -> None:
+        """
+        Store each protein's SIMILAR_TO degree as p.degree.
+        
+        Run after the edges change (the graph builder does); the graph
+        statistics read isolated and most-connected proteins from it instead
+        of counting the relationships of every node.
+        """
+        with self.session() as session:
+            # CALL ... IN TRANSACTIONS needs an auto-commit transaction
+            session.run(
+                """
+                MATCH (p:Protein)
+                CALL {
+                    WITH p
+                    SET p.degree = COUNT { (p)-[:SIMILAR_TO]-() }
+                } IN TRANSACTIONS OF $batch_size ROWS
+                """,
+                batch_size=batch_size
+            ).consume()
+    
+    def get_protein_node(self, protein_id: str, session: Optional[Session] = None) -> Optional[Dict]:
+        with self._read_session(session) as session:
+            return _single(self._read(
+                session,
+                "MATCH (p:Protein {id: $id}) RETURN properties(p) AS p LIMIT 1",
+                map_record=_node,
                 id=protein_id
+            ))
+    
+    def get_protein_nodes_batch(self, protein_ids: List[str],
+                                session: Optional[Session] = None) -> Dict[str, Dict]:
+        """
+        Fetch several protein nodes in one query, keyed by protein id.
+        """
+        with self._read_session(session) as session:
+            result = self._read(
+                session,
+                "MATCH (p:Protein) WHERE p.id IN $ids RETURN properties(p) AS p",
+                map_record=_node,
+                ids=protein_ids
             )
-            record = result.single()
-            if record:
-                return dict(record['p'])
-            return None
+            
+            return {protein['id']: protein for protein in result}
     
     def get_neighbors(self, protein_id: str, depth: int = 1, 
-                     min_weight: float = 0.0, limit: int = 50) -> Optional[Dict]:
-        with self.driver.session() as session:
-            if depth == 1:
-                query = """
-                MATCH (p:Protein {id: $id})
-                OPTIONAL MATCH (p)-[r:SIMILAR_TO]-(neighbor:Protein)
-                WHERE r.weight >= $min_weight
-                WITH p, neighbor, r
-                ORDER BY r.weight DESC
-                LIMIT $limit
-                RETURN p, collect({neighbor: neighbor, weight: r.weight}) as neighbors
-                """
-            else:  
-                query = """
-                MATCH (p:Protein {id: $id})
-                OPTIONAL MATCH path = (p)-[r1:SIMILAR_TO]-(n1:Protein)-[r2:SIMILAR_TO]-(n2:Protein)
-                WHERE r1.weight >= $min_weight AND r2.weight >= $min_weight
-                AND n2.id <> p.id
-                WITH p, n1, n2, r1, r2
-                ORDER BY r1.weight DESC, r2.weight DESC
-                LIMIT $limit
-                RETURN p, 
-                       collect(DISTINCT {neighbor: n1, weight: r1.weight}) as neighbors1,
-                       collect(DISTINCT {neighbor: n2, weight: r2.weight}) as neighbors2
-                """
-            
-            result = session.run(query, id=protein_id, min_weight=min_weight, limit=limit)
-            record = result.single()
+                     min_weight: float = 0.0, limit: int = 50,
+                     session: Optional[Session] = None) -> Optional[Dict]:
+        with self._read_session(session) as session:
+            query = NEIGHBORS_QUERY if depth == 1 else NEIGHBORS_DEPTH2_QUERY
+            result = self._read(session, query, id=protein_id, min_weight=min_weight, limit=limit)
+            record = _single(result)
             
             if record:
-                protein = dict(record['p'])
+                protein = record['p']
                 
                 if depth == 1:
                     neighbors = []
                     for item in record['neighbors']:
                         if item['neighbor']:
                             neighbors.append({
-                                'protein': dict(item['neighbor']),
+                                'protein': item['neighbor'],
                                 'weight': item['weight']
                             })
                     return {
@@ -94,162 +435,213 @@ class Neo4jClient:
                         'count': len(neighbors)
                     }
                 else:
-                    all_neighbors = []
-                    seen = set()
-                    
-                    for item in record['neighbors1']:
-                        if item['neighbor']:
-                            nid = item['neighbor']['id']
-                            if nid not in seen:
-                                all_neighbors.append({
-                                    'protein': dict(item['neighbor']),
-                                    'weight': item['weight'],
-                                    'distance': 1
-                                })
-                                seen.add(nid)
-                    
-                    for item in record['neighbors2']:
-                        if item['neighbor']:
-                            nid = item['neighbor']['id']
-                            if nid not in seen:
-                                all_neighbors.append({
-                                    'protein': dict(item['neighbor']),
-                                    'weight': item['weight'],
-                                    'distance': 2
-                                })
-                                seen.add(nid)
-                    
                     return {
                         'protein': protein,
-                        'neighbors': all_neighbors,
+                        'neighbors': record['neighbors'],
                         'depth': depth,
-                        'count': len(all_neighbors)
+                        'count': len(record['neighbors'])
                     }
             
             return None
     
     def get_neighborhood_visualization(self, protein_id: str, depth: int = 2,
                                       min_weight: float = 0.1, limit: int = 100) -> Optional[Dict]:
-        with self.driver.session() as session:
-            center_result = session.run("MATCH (p:Protein {id: $id}) RETURN p", id=protein_id)
-            center_record = center_result.single()
-            
-            if not center_record:
-                return None
-            
-            center = dict(center_record['p'])
-            nodes = [center]
-            edges = []
-            seen_nodes = {protein_id}
-            
+        nodes = []
+        edges = []
+        
+        for kind, item in self.iter_neighborhood_visualization(protein_id, depth, min_weight, limit):
+            if kind == 'node':
+                nodes.append(item)
+            else:
+                edges.append(item)
+        
+        if not nodes:
+            return None
+        
+        return {
+            'nodes': nodes,
+            'edges': edges,
+            'center_id': protein_id,
+            'node_count': len(nodes),
+            'edge_count': len(edges)
+        }
+    
+    def iter_neighborhood_visualization(self, protein_id: str, depth: int = 2,
+                                        min_weight: float = 0.1,
+                                        limit: int = 100) -> Iterator[Tuple[str, Union[Dict, EdgeRow]]]:
+        """
+        Stream the neighborhood of a protein as ('node', dict) and ('edge', EdgeRow) pairs.
+        
+        Records are pulled from the driver as they are consumed, so callers can start
+        writing output before the traversal finishes. The center node always comes
+        first; nothing is yielded if the protein is not in the graph.
+        """
+        with self._read_session() as session:
+            # The center node and its level-1 neighbors arrive in one query (the
+            # center as the first row), saving a round-trip per request. Nodes
+            # come back in their final shape: a slim map with only what the
+            # visualization draws (full nodes are on /api/neo4j/protein/<id>)
+            # plus the is_center / label_type flags, built by map projection
             level1_result = session.run(
                 """
-                MATCH (center:Protein {id: $id})-[r:SIMILAR_TO]-(n:Protein)
-                WHERE r.weight >= $min_weight
-                RETURN n, r.weight as weight, 
-                       CASE WHEN startNode(r).id = $id THEN endNode(r).id ELSE startNode(r).id END as neighbor_id
-                ORDER BY r.weight DESC
-                LIMIT $limit
+                MATCH (center:Protein {id: $id})
+                CALL {
+                    WITH center
+                    RETURN center {
+                               .id,
+                               .name,
+                               is_labeled: coalesce(center.is_labeled, false),
+                               is_center: true,
+                               label_type: CASE WHEN center.is_labeled = true THEN 'labeled' ELSE 'unlabeled' END
+                           } AS n,
+                           null AS weight,
+                           0 AS distance
+                    UNION ALL
+                    WITH center
+                    MATCH (center)-[r:SIMILAR_TO]-(n:Protein)
+                    WHERE r.weight >= $min_weight
+                    WITH n, r.weight AS weight
+                    ORDER BY weight DESC
+                    LIMIT $limit
+                    RETURN n {
+                               .id,
+                               .name,
+                               is_labeled: coalesce(n.is_labeled, false),
+                               is_center: false,
+                               label_type: CASE WHEN n.is_labeled = true THEN 'labeled' ELSE 'unlabeled' END
+                           } AS n,
+                           weight,
+                           1 AS distance
+                }
+                RETURN n, n.id AS neighbor_id, weight, distance
+                ORDER BY distance, weight DESC
                 """,
                 id=protein_id,
                 min_weight=min_weight,
                 limit=limit
             )
             
+            records = iter(level1_result)
+            center_record = next(records, None)
+            
+            if not center_record:
+                return
+            
+            center = center_record['n']
+            yield 'node', center
+            # Node dicts by id: setdefault inserts and reports a first sighting
+            # in one hash lookup (it returns the node just passed in)
+            seen_nodes = {protein_id: center}
+            
             level1_neighbors = []
-            for record in level1_result:
-                neighbor = dict(record['n'])
+            for record in records:
                 neighbor_id = record['neighbor_id']
-                weight = record['weight']
+                node = record['n']
                 
-                if neighbor_id not in seen_nodes:
-                    nodes.append(neighbor)
-                    seen_nodes.add(neighbor_id)
+                if seen_nodes.setdefault(neighbor_id, node) is node:
                     level1_neighbors.append(neighbor_id)
+                    yield 'node', node
                 
-                edges.append({
-                    'source': protein_id,
-                    'target': neighbor_id,
-                    'weight': weight
-                })
+                yield 'edge', EdgeRow(protein_id, neighbor_id, record['weight'])
             
             if depth == 2 and level1_neighbors:
-                for level1_id in level1_neighbors[:min(50, len(level1_neighbors))]:  # Limit level 2 expansion to 50
-                    level2_result = session.run(
-                        """
-                        MATCH (n1:Protein {id: $id})-[r:SIMILAR_TO]-(n2:Protein)
-                        WHERE r.weight >= $min_weight 
-                          AND n2.id <> $center_id
-                          AND n2.id <> $id
-                        RETURN n2, r.weight as weight,
-                               CASE WHEN startNode(r).id = $id THEN endNode(r).id ELSE startNode(r).id END as neighbor_id
-                        ORDER BY r.weight DESC
-                        LIMIT 5
-                        """,
-                        id=level1_id,
-                        center_id=protein_id,
-                        min_weight=min_weight
-                    )
+                # Top 5 neighbors of each of the first 50 level-1 nodes, fetched
+                # in one UNWIND query instead of one query per level-1 node
+                level2_result = session.run(
+                    """
+                    UNWIND range(0, size($ids) - 1) AS position
+                    WITH position, $ids[position] AS level1_id
+                    MATCH (n1:Protein {id: level1_id})-[r:SIMILAR_TO]-(n2:Protein)
+                    WHERE r.weight >= $min_weight
+                      AND n2.id <> $center_id
+                      AND n2.id <> level1_id
+                    WITH position, level1_id, n2, r.weight AS weight
+                    ORDER BY weight DESC
+                    WITH position, level1_id, collect({node: n2, weight: weight})[0..5] AS top
+                    UNWIND top AS item
+                    WITH position, level1_id, item.node AS n2, item.weight AS weight
+                    RETURN level1_id,
+                           n2 {
+                               .id,
+                               .name,
+                               is_labeled: coalesce(n2.is_labeled, false),
+                               is_center: false,
+                               label_type: CASE WHEN n2.is_labeled = true THEN 'labeled' ELSE 'unlabeled' END
+                           } AS n2,
+                           n2.id AS neighbor_id,
+                           weight
+                    ORDER BY position, weight DESC
+                    """,
+                    ids=level1_neighbors[:50],
+                    center_id=protein_id,
+                    min_weight=min_weight
+                )
+                
+                for record in level2_result:
+                    neighbor_id = record['neighbor_id']
+                    node = record['n2']
                     
-                    for record in level2_result:
-                        neighbor = dict(record['n2'])
-                        neighbor_id = record['neighbor_id']
-                        weight = record['weight']
-                        
-                        if neighbor_id not in seen_nodes:
-                            nodes.append(neighbor)
-                            seen_nodes.add(neighbor_id)
-                        
-                        edges.append({
-                            'source': level1_id,
-                            'target': neighbor_id,
-                            'weight': weight
-                        })
-            
-            # Add node metadata
-            for node in nodes:
-                node['is_center'] = (node['id'] == protein_id)
-                node['label_type'] = 'labeled' if node.get('is_labeled', False) else 'unlabeled'
-            
-            return {
-                'nodes': nodes,
-                'edges': edges,
-                'center_id': protein_id,
-                'node_count': len(nodes),
-                'edge_count': len(edges)
-            }
+                    if seen_nodes.setdefault(neighbor_id, node) is node:
+                        yield 'node', node
+                    
+                    yield 'edge', EdgeRow(record['level1_id'], neighbor_id, record['weight'])
     
-    def search_proteins(self, search_term: str, limit: int = 50) -> List[Dict]:
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (p:Protein)
-                WHERE p.id =~ $regex OR p.name =~ $regex OR p.entry_name =~ $regex
-                RETURN p
-                LIMIT $limit
-                """,
-                regex=f"(?i).*{search_term}.*",
-                limit=limit
-            )
-            
+    def search_proteins(self, search_term: str, limit: int = 50,
+                        session: Optional[Session] = None) -> List[Dict]:
+        with self._read_session(session) as session:
             proteins = []
-            for record in result:
-                proteins.append(dict(record['p']))
+            
+            # Accession prefixes can be served by the protein_id range index
+            if ACCESSION_PREFIX.match(search_term):
+                proteins = self._read(
+                    session,
+                    """
+                    MATCH (p:Protein)
+                    WHERE p.id STARTS WITH $prefix
+                    RETURN properties(p) AS p
+                    ORDER BY p.id
+                    LIMIT $limit
+                    """,
+                    map_record=_node,
+                    prefix=search_term.upper(),
+                    limit=limit
+                )
+            
+            # Word-prefix lookup in the full-text index, ranked by relevance
+            if len(proteins) < limit and search_term.strip():
+                result = self._read(
+                    session,
+                    """
+                    CALL db.index.fulltext.queryNodes($index, $query) YIELD node, score
+                    WHERE NOT node.id IN $exclude
+                    RETURN properties(node) AS p
+                    ORDER BY score DESC
+                    LIMIT $limit
+                    """,
+                    map_record=_node,
+                    index=self.SEARCH_INDEX_NAME,
+                    query=_fulltext_query(search_term),
+                    exclude=[protein['id'] for protein in proteins],
+                    limit=limit - len(proteins)
+                )
+                proteins.extend(result)
             
             return proteins
     
-    def get_adaptive_threshold(self, protein_id: str, target_neighbors: int = 10) -> Dict:
-        with self.driver.session() as session:
-            result = session.run(
+    def get_adaptive_threshold(self, protein_id: str, target_neighbors: int = 10,
+                               session: Optional[Session] = None) -> Dict:
+        with self._read_session(session) as session:
+            weights = self._read(
+                session,
                 """
                 MATCH (p:Protein {id: $id})-[r:SIMILAR_TO]-()
                 RETURN r.weight as weight
                 ORDER BY r.weight DESC
                 """,
+                # Hubs have thousands of edges: keep plain floats, not records
+                map_record=lambda record: record['weight'],
                 id=protein_id
             )
-            
-            weights = [record['weight'] for record in result]
             total_neighbors = len(weights)
             
             if total_neighbors == 0:
@@ -283,56 +675,52 @@ class Neo4jClient:
                 }
             }
     
-    def get_graph_statistics(self) -> Dict:
+    def get_graph_statistics(self, session: Optional[Session] = None) -> Dict:
         """
         Get comprehensive graph statistics.
         
+        Every figure is computed by one query (independent CALL subqueries),
+        so the whole summary costs a single transaction and round-trip.
+        
         Returns:
             Dictionary with graph statistics
         """
-        with self.driver.session() as session:
-            # Total node count
-            total_result = session.run("MATCH (p:Protein) RETURN count(p) as count")
-            total_count = total_result.single()['count']
-            
-            # Labeled vs unlabeled
-            labeled_result = session.run(
-                "MATCH (p:Protein) WHERE p.is_labeled = true RETURN count(p) as count"
+        with self._read_session(session) as session:
+            result = self._read(
+                session,
+                """
+                // Total and labeled counts share one pass over the Protein label
+                CALL {
+                    MATCH (p:Protein)
+                    RETURN count(p) AS total,
+                           sum(CASE WHEN p.is_labeled = true THEN 1 ELSE 0 END) AS labeled
+                }
+                CALL { MATCH ()-[r:SIMILAR_TO]->() RETURN count(r) AS edges }
+                // Isolated and most connected proteins come from the stored
+                // degree (see update_degrees) through the protein_degree index
+                CALL { MATCH (p:Protein) WHERE p.degree = 0 RETURN count(p) AS isolated }
+                CALL {
+                    MATCH (p:Protein)
+                    WHERE p.degree > 0
+                    WITH p
+                    ORDER BY p.degree DESC
+                    LIMIT 10
+                    RETURN collect({protein_id: p.id, protein_name: p.name, degree: p.degree}) AS top_connected
+                }
+                RETURN total, labeled, edges, isolated, top_connected
+                """
             )
-            labeled_count = labeled_result.single()['count']
-            unlabeled_count = total_count - labeled_count
-            
-            # Edge count
-            edge_result = session.run("MATCH ()-[r:SIMILAR_TO]->() RETURN count(r) as count")
-            edge_count = edge_result.single()['count']
+            record = _single(result)
             
-            # Isolated proteins (no neighbors)
-            isolated_result = session.run(
-                "MATCH (p:Protein) WHERE NOT (p)-[:SIMILAR_TO]-() RETURN count(p) as count"
-            )
-            isolated_count = isolated_result.single()['count']
+            total_count = record['total']
+            labeled_count = record['labeled']
+            unlabeled_count = total_count - labeled_count
+            edge_count = record['edges']
+            isolated_count = record['isolated']
             
             # Average degree
             avg_degree = (2 * edge_count / total_count) if total_count > 0 else 0
             
-            # Degree distribution (top 10 most connected)
-            degree_result = session.run(
-                """
-                MATCH (p:Protein)-[r:SIMILAR_TO]-()
-                WITH p, count(r) as degree
-                RETURN p.id as protein_id, p.name as protein_name, degree
-                ORDER BY degree DESC
-                LIMIT 10
-                """
-            )
-            top_connected = []
-            for record in degree_result:
-                top_connected.append({
-                    'protein_id': record['protein_id'],
-                    'protein_name': record['protein_name'],
-                    'degree': record['degree']
-                })
-            
             return {
                 'total_proteins': total_count,
                 'labeled_proteins': labeled_count,
@@ -342,7 +730,7 @@ class Neo4jClient:
                 'isolated_proteins': isolated_count,
                 'isolated_percentage': round((isolated_count / total_count * 100), 2) if total_count > 0 else 0,
                 'average_degree': round(avg_degree, 2),
-                'top_connected_proteins': top_connected
+                'top_connected_proteins': record['top_connected']
             }
     
     def close(self):
@@ -1,9 +1,36 @@
+import csv
 import os
 import sys
-from typing import Dict, List, Set, Tuple
-from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+import threading
+import numpy as np
+import scipy.sparse as sp
 from database.mongodb_client import MongoDBClient
 from database.neo4j_client import Neo4jClient
+from neo4j import Session
+from stats_version import bump_stats_version
+
+# Fields read from MongoDB: the node properties plus the domains used for
+# similarity (sequences and _id are never transferred)
+NODE_FIELDS = ('identifier', 'entry_name', 'name', 'organism', 'is_labeled',
+               'ec_numbers', 'interpro_domains', 'sequence_length')
+
+# Headers of the neo4j-admin import files written by the export mode
+# (lists use the tool's default ';' array delimiter)
+NODES_CSV = 'nodes.csv'
+EDGES_CSV = 'edges.csv'
+NODES_HEADER = ('id:ID', 'entry_name', 'name', 'organism', 'is_labeled:boolean',
+                'ec_numbers:string[]', 'interpro_domains:string[]', 'sequence_length:int')
+EDGES_HEADER = (':START_ID', ':END_ID', 'weight:double')
+
+# Blocks expanding to more member edges than this are streamed to the
+# writers from the main thread instead of being expanded on a scoring thread
+EXPAND_LIMIT = 4000000
 
 
 class ProteinGraphBuilder:
@@ -27,6 +54,10 @@ class ProteinGraphBuilder:
             'unlabeled_nodes': 0,
             'comparisons': 0
         }
+        # Internal Neo4j id of every node created by this builder
+        self.node_ids = {}
+        # Edge batches are counted from the writer threads
+        self._stats_lock = threading.Lock()
     
     def calculate_jaccard_similarity(self, domains1: Set[str], domains2: Set[str]) -> float:
         """
@@ -35,13 +66,11 @@ class ProteinGraphBuilder:
         if not domains1 or not domains2:
             return 0.0
         
-        intersection = domains1.intersection(domains2)
-        union = domains1.union(domains2)
-        
-        if len(union) == 0:
-            return 0.0
-        
-        return len(intersection) / len(union)
+        # |A ∪ B| = |A| + |B| - |A ∩ B|: no union set is built, and the
+        # intersection is counted by probing the larger set with the smaller
+        small, large = (domains1, domains2) if len(domains1) <= len(domains2) else (domains2, domains1)
+        intersection = sum(1 for domain in small if domain in large)
+        return intersection / (len(domains1) + len(domains2) - intersection)
     
     def load_proteins_from_mongodb(self, limit: int = None) -> List[Dict]:
         """
@@ -59,7 +88,9 @@ class ProteinGraphBuilder:
             'interpro_domains': {'$exists': True, '$ne': []}
         }
         
-        cursor = self.mongo_client.proteins.find(query)
+        projection = dict.fromkeys(NODE_FIELDS, 1)
+        projection['_id'] = 0
+        cursor = self.mongo_client.proteins.find(query, projection).batch_size(1000)
         if limit:
             cursor = cursor.limit(limit)
         
@@ -84,146 +115,399 @@ class ProteinGraphBuilder:
         print("CREATING PROTEIN NODES IN NEO4J")
         print(f"{'='*60}\n")
         
-        batch_size = 500
+        # Large UNWIND batches amortize the round-trip and transaction cost;
+        # one session serves them all
+        batch_size = 10000
         batch = []
         
-        for i, protein in enumerate(proteins):
-            # Prepare node properties
-            node_data = {
-                'id': protein['identifier'],
-                'entry_name': protein.get('entry_name', ''),
-                'name': protein.get('name', ''),
-                'organism': protein.get('organism', ''),
-                'is_labeled': protein.get('is_labeled', False),
-                'ec_numbers': protein.get('ec_numbers', []),
-                'interpro_domains': protein.get('interpro_domains', []),
-                'sequence_length': protein.get('sequence_length', 0)
-            }
-            
-            batch.append(node_data)
-            
-            # Track statistics
-            if protein.get('is_labeled', False):
-                self.stats['labeled_nodes'] += 1
-            else:
-                self.stats['unlabeled_nodes'] += 1
-            
-            # Insert batch
-            if len(batch) >= batch_size:
-                self._create_node_batch(batch)
-                batch = []
+        with self.neo4j_client.session() as session:
+            for i, protein in enumerate(proteins):
+                node = self._node_data(protein)
+                batch.append(node)
                 
-                if (i + 1) % 5000 == 0:
+                # Track statistics
+                if node['is_labeled']:
+                    self.stats['labeled_nodes'] += 1
+                else:
+                    self.stats['unlabeled_nodes'] += 1
+                
+                # Insert batch
+                if len(batch) >= batch_size:
+                    self._create_node_batch(batch, session)
+                    batch = []
                     print(f"Created {i + 1:,} nodes...")
-        
-        # Insert remaining nodes
-        if batch:
-            self._create_node_batch(batch)
+            
+            # Insert remaining nodes
+            if batch:
+                self._create_node_batch(batch, session)
         
         print(f"\n✓ Created {self.stats['nodes_created']:,} protein nodes")
         print(f"  - Labeled: {self.stats['labeled_nodes']:,}")
         print(f"  - Unlabeled: {self.stats['unlabeled_nodes']:,}")
     
-    def _create_node_batch(self, batch: List[Dict]) -> None:
-        """
-        Create a batch of protein nodes in Neo4j.
-        Uses Cypher UNWIND for efficient batch creation.
-        """
-        with self.neo4j_client.driver.session() as session:
-            session.run("""
-                UNWIND $batch AS protein
-                CREATE (p:Protein {
-                    id: protein.id,
-                    entry_name: protein.entry_name,
-                    name: protein.name,
-                    organism: protein.organism,
-                    is_labeled: protein.is_labeled,
-                    ec_numbers: protein.ec_numbers,
-                    interpro_domains: protein.interpro_domains,
-                    sequence_length: protein.sequence_length
-                })
-            """, batch=batch)
-        
+    def export_protein_nodes(self, proteins: List[Dict], directory: str) -> str:
+        """
+        Write the protein nodes to a neo4j-admin import file instead of Neo4j.
+        """
+        path = os.path.join(directory, NODES_CSV)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(NODES_HEADER)
+            for protein in proteins:
+                node = self._node_data(protein)
+                writer.writerow((
+                    node['id'], node['entry_name'], node['name'], node['organism'],
+                    'true' if node['is_labeled'] else 'false',
+                    ';'.join(node['ec_numbers']), ';'.join(node['interpro_domains']),
+                    node['sequence_length']
+                ))
+                if node['is_labeled']:
+                    self.stats['labeled_nodes'] += 1
+                else:
+                    self.stats['unlabeled_nodes'] += 1
+        self.stats['nodes_created'] += len(proteins)
+        print(f"✓ Wrote {len(proteins):,} protein nodes to {path}")
+        return path
+    
+    @staticmethod
+    def _node_data(protein: Dict) -> Dict:
+        """
+        Node properties of a protein document.
+        """
+        return {
+            'id': protein['identifier'],
+            'entry_name': protein.get('entry_name', ''),
+            'name': protein.get('name', ''),
+            'organism': protein.get('organism', ''),
+            'is_labeled': protein.get('is_labeled', False),
+            'ec_numbers': protein.get('ec_numbers', []),
+            'interpro_domains': protein.get('interpro_domains', []),
+            'sequence_length': protein.get('sequence_length', 0)
+        }
+    
+    def _create_node_batch(self, batch: List[Dict], session: Session) -> None:
+        """
+        Create a batch of protein nodes in Neo4j (one UNWIND query).
+        """
+        self.node_ids.update(self.neo4j_client.create_protein_nodes(batch, len(batch), session))
         self.stats['nodes_created'] += len(batch)
     
     def create_similarity_edges(self, proteins: List[Dict], 
-                               batch_size: int = 1000) -> None:
+                               batch_size: int = 10000, writers: int = 4,
+                               scorers: Optional[int] = None,
+                               group_by: Optional[str] = None,
+                               export_path: Optional[str] = None) -> None:
         """
         Create similarity edges between proteins based on Jaccard coefficient.
+        
+        With group_by (a protein field such as 'organism'), only proteins with
+        the same value of that field are compared. With export_path, the edges
+        are written to that neo4j-admin import file (by a single writer)
+        instead of Neo4j.
+        
+        Row blocks are scored on `scorers` threads (default: one per CPU)
+        while `writers` threads insert the finished batches into Neo4j, so
+        computation and network writes overlap.
         """
         print(f"\n{'='*60}")
         print("CREATING SIMILARITY EDGES")
         print(f"{'='*60}\n")
         print(f"Similarity threshold: {self.similarity_threshold}")
-        print(f"Maximum comparisons: {len(proteins) * (len(proteins) - 1) // 2:,}\n")
+        print("Candidate pairs: proteins sharing at least one domain"
+              + (f" (same {group_by})\n" if group_by else "\n"))
         
-        # Prepare domain sets for fast lookup
-        protein_domains = {}
+        # Domain accessions are interned to small integer ids as proteins are
+        # read, and proteins with the same domain set (and group) share one
+        # signature: pairs are scored once per pair of signatures, then
+        # expanded to their member proteins
+        domain_index = {}
+        signature_index = {}
+        protein_ids, protein_signatures = [], []
+        group_index, groups = {}, []
+        rows, columns = [], []
         for protein in proteins:
-            pid = protein['identifier']
-            domains = set(protein.get('interpro_domains', []))
-            if domains:
-                protein_domains[pid] = domains
-        
-        protein_ids = list(protein_domains.keys())
+            domains = frozenset(
+                domain_index.setdefault(domain, len(domain_index))
+                for domain in protein.get('interpro_domains', [])
+            )
+            if not domains:
+                continue
+            key = (protein.get(group_by), domains) if group_by else domains
+            signature = signature_index.get(key)
+            if signature is None:
+                signature = signature_index[key] = len(signature_index)
+                rows.extend([signature] * len(domains))
+                columns.extend(domains)
+                if group_by:
+                    groups.append(group_index.setdefault(protein.get(group_by), len(group_index)))
+            protein_ids.append(protein['identifier'])
+            protein_signatures.append(signature)
+        signature_count = len(signature_index)
+        # Edges waiting to be queued, as (ids1, ids2, weights) array chunks
         edges_batch = []
+        pending = 0
         
-        # Compare all pairs
-        total_pairs = len(protein_ids) * (len(protein_ids) - 1) // 2
-        processed = 0
+        # Signature x domain incidence matrix (sparse, one 1 per domain).
+        # The product B @ B.T holds |A ∩ B| for every pair sharing at least one
+        # domain (all other pairs have a Jaccard coefficient of 0 and never
+        # appear); it is computed in C by scipy, a block of rows at a time
+        incidence = sp.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, columns)),
+            shape=(signature_count, len(domain_index))
+        )
         
-        for i in range(len(protein_ids)):
-            for j in range(i + 1, len(protein_ids)):
-                id1 = protein_ids[i]
-                id2 = protein_ids[j]
-                
-                # Calculate Jaccard similarity
-                similarity = self.calculate_jaccard_similarity(
-                    protein_domains[id1],
-                    protein_domains[id2]
+        # Signatures sorted by domain count: the partners j >= i of signature i
+        # have at least as many domains, and Jaccard >= threshold also bounds
+        # them to at most sizes[i] / threshold domains, so each block only
+        # needs the columns of a narrow size window. With group_by, signatures
+        # are sorted by group first and each group is scanned on its own
+        sizes = np.diff(incidence.indptr)
+        if group_by:
+            groups = np.array(groups)
+            order = np.lexsort((sizes, groups))
+            bounds = (np.flatnonzero(np.diff(groups[order])) + 1).tolist()
+        else:
+            order = np.argsort(sizes, kind='stable')
+            bounds = []
+        group_ranges = list(zip([0] + bounds, bounds + [signature_count]))
+        incidence, sizes = incidence[order], sizes[order]
+        incidence_t = incidence.T.tocsc()
+        
+        # Members of each (sorted) signature: members[starts[s]:starts[s] + counts[s]]
+        rank = np.empty(signature_count, dtype=np.int64)
+        rank[order] = np.arange(signature_count)
+        protein_signatures = rank[np.array(protein_signatures, dtype=np.int64)]
+        counts = np.bincount(protein_signatures, minlength=signature_count)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        members = np.argsort(protein_signatures, kind='stable')
+        
+        # Edges are created between internal node ids when this builder created
+        # every node (no index lookup per endpoint), else by protein id
+        by_node_id = not export_path and all(pid in self.node_ids for pid in protein_ids)
+        if by_node_id:
+            id_array = np.array([self.node_ids[pid] for pid in protein_ids], dtype=np.int64)
+        else:
+            id_array = np.array(protein_ids, dtype=object)
+        id_array = id_array[members]
+        
+        scorers = scorers or os.cpu_count() or 1
+        
+        # Bounded queue: scoring stalls rather than buffering edges in memory
+        # when the writers fall behind
+        if export_path:
+            writers = 1
+        batches = Queue(maxsize=2 * writers)
+        with ThreadPoolExecutor(max_workers=writers) as pool:
+            futures = [pool.submit(self._edge_writer, batches, by_node_id, export_path) for _ in range(writers)]
+            try:
+                block_size = 256
+                blocks = (
+                    (start, min(start + block_size, group_stop), group_start, group_stop)
+                    for group_start, group_stop in group_ranges
+                    for start in range(group_start, group_stop, block_size)
                 )
+                tasks = (
+                    (start, stop, self._window(sizes, stop, group_start, group_stop))
+                    for start, stop, group_start, group_stop in blocks
+                )
+                score = partial(self._score_block, incidence, incidence_t, sizes, counts, starts, id_array)
                 
-                self.stats['comparisons'] += 1
-                processed += 1
-                
-                # Create edge if above threshold
-                if similarity >= self.similarity_threshold:
-                    edges_batch.append({
-                        'id1': id1,
-                        'id2': id2,
-                        'weight': similarity
-                    })
-                    
-                    # Insert batch
-                    if len(edges_batch) >= batch_size:
-                        self._create_edge_batch(edges_batch)
-                        edges_batch = []
+                # Blocks are scored on `scorers` threads, a bounded number
+                # ahead, and their edges are queued in block order
+                with ThreadPoolExecutor(max_workers=scorers) as scoring:
+                    scored = self._map_bounded(scoring, score, tasks, 2 * scorers)
+                    for (start, stop, _), (comparisons, chunks) in scored:
+                        self.stats['comparisons'] += comparisons
+                        for chunk in chunks:
+                            edges_batch.append(chunk)
+                            pending += len(chunk[2])
+                            
+                            # Insert full batches, keep the remainder for the next chunk
+                            if pending >= batch_size:
+                                edges_batch = self._queue_edge_batches(batches, edges_batch, batch_size)
+                                pending = len(edges_batch[0][2]) if edges_batch else 0
+                        
+                        # Progress update (about every 10,000 signatures)
+                        if stop // 10000 > start // 10000 or stop == signature_count:
+                            print(f"Progress: {stop:,}/{signature_count:,} domain signatures - "
+                                  f"Comparisons: {self.stats['comparisons']:,} - Edges: {self.stats['edges_created']:,}")
                 
-                # Progress update
-                if processed % 100000 == 0:
-                    progress = (processed / total_pairs) * 100
-                    print(f"Progress: {processed:,}/{total_pairs:,} comparisons "
-                          f"({progress:.1f}%) - Edges: {self.stats['edges_created']:,}")
+                # Insert remaining edges
+                if edges_batch:
+                    self._queue_edge_batches(batches, edges_batch, batch_size, final=True)
+            finally:
+                # Stop the writers (one None each), also when scoring fails
+                for _ in futures:
+                    batches.put(None)
+            for future in futures:
+                future.result()
         
-        # Insert remaining edges
-        if edges_batch:
-            self._create_edge_batch(edges_batch)
+        if export_path:
+            print(f"\n✓ Wrote {self.stats['edges_created']:,} similarity edges to {export_path}")
+            return
         
         print(f"\n✓ Created {self.stats['edges_created']:,} similarity edges")
+        
+        # Degrees back the graph statistics (isolated / most connected proteins)
+        self.neo4j_client.update_degrees()
+        print("✓ Updated protein degrees")
+    
+    def _window(self, sizes: np.ndarray, stop: int, group_start: int, group_stop: int) -> int:
+        """
+        End of the columns a block ending at stop can reach: signatures with at
+        most max size / threshold domains (sizes are sorted within the group).
+        """
+        if self.similarity_threshold <= 0:
+            return group_stop
+        # Small tolerance so rounding never drops a boundary pair
+        max_size = sizes[stop - 1] / self.similarity_threshold * (1 + 1e-9)
+        return group_start + int(np.searchsorted(sizes[group_start:group_stop], max_size, side='right'))
+    
+    def _score_block(self, incidence: sp.csr_matrix, incidence_t: sp.csc_matrix,
+                     sizes: np.ndarray, counts: np.ndarray, starts: np.ndarray,
+                     id_array: np.ndarray, start: int, stop: int, window: int):
+        """
+        Score signature rows start:stop against columns start:window.
+        
+        Runs on a scoring thread (the sparse product and the numpy arithmetic
+        release the GIL). Returns the number of signature pairs compared and
+        the (ids1, ids2, weights) edge chunks of the member proteins; a block
+        expanding to more than EXPAND_LIMIT edges returns them as a lazy
+        iterator instead, so a very large clique is streamed, not buffered.
+        """
+        shared = (incidence[start:stop] @ incidence_t[:, start:window]).tocoo()
+        
+        # Upper triangle only: each pair once; a signature is kept
+        # paired with itself (Jaccard 1) when it has several members
+        first = shared.row + start
+        second = shared.col + start
+        upper = (second > first) | ((second == first) & (counts[first] > 1))
+        first, second, intersection = first[upper], second[upper], shared.data[upper]
+        
+        # Jaccard = |A ∩ B| / |A ∪ B|, with |A ∪ B| = |A| + |B| - |A ∩ B|
+        similarity = intersection / (sizes[first] + sizes[second] - intersection)
+        
+        # Edges above threshold, between the member proteins
+        keep = similarity >= self.similarity_threshold
+        first, second, similarity = first[keep], second[keep], similarity[keep]
+        chunks = (
+            (id_array[a], id_array[b], weight)
+            for a, b, weight in self._expand_pairs(first, second, similarity, counts, starts)
+        )
+        if int((counts[first] * counts[second]).sum()) <= EXPAND_LIMIT:
+            chunks = list(chunks)
+        return int(intersection.size), chunks
+    
+    @staticmethod
+    def _map_bounded(pool: ThreadPoolExecutor, fn: Callable, tasks: Iterator[Tuple],
+                     lookahead: int) -> Iterator[Tuple[Tuple, object]]:
+        """
+        Yield (task, fn(*task)) in task order, with at most lookahead calls in flight.
+        """
+        in_flight = deque()
+        for task in tasks:
+            in_flight.append((task, pool.submit(fn, *task)))
+            if len(in_flight) >= lookahead:
+                task, future = in_flight.popleft()
+                yield task, future.result()
+        while in_flight:
+            task, future = in_flight.popleft()
+            yield task, future.result()
     
-    def _create_edge_batch(self, batch: List[Dict]) -> None:
+    @staticmethod
+    def _expand_pairs(first: np.ndarray, second: np.ndarray, similarity: np.ndarray,
+                      counts: np.ndarray, starts: np.ndarray,
+                      chunk_size: int = 1000000) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
         """
-        Create a batch of similarity edges in Neo4j.
+        Expand signature pairs to member pairs, chunk_size candidates at a time.
+        
+        Yields (a, b, weight) arrays of positions in the member list; a
+        signature paired with itself yields each pair of its members once.
+        """
+        pair_sizes = counts[first] * counts[second]
+        ends = np.cumsum(pair_sizes)
+        total = int(ends[-1]) if len(ends) else 0
+        for low in range(0, total, chunk_size):
+            index = np.arange(low, min(low + chunk_size, total))
+            pair = np.searchsorted(ends, index, side='right')
+            local = index - (ends[pair] - pair_sizes[pair])
+            width = counts[second[pair]]
+            i, j = local // width, local % width
+            keep = (first[pair] != second[pair]) | (i < j)
+            pair, i, j = pair[keep], i[keep], j[keep]
+            yield starts[first[pair]] + i, starts[second[pair]] + j, similarity[pair]
+    
+    @staticmethod
+    def _queue_edge_batches(batches: Queue, chunks: List[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+                            batch_size: int, final: bool = False) -> List[Tuple]:
+        """
+        Queue (ids1, ids2, weights) edge chunks as batches of batch_size edges.
+        
+        Returns the chunk left over (a partial batch), unless final.
+        """
+        columns = [np.concatenate(column) for column in zip(*chunks)]
+        total = len(columns[2])
+        full = total if final else total - total % batch_size
+        for offset in range(0, full, batch_size):
+            batches.put(tuple(column[offset:offset + batch_size] for column in columns))
+        return [tuple(column[full:] for column in columns)] if full < total else []
+    
+    def _edge_writer(self, batches: Queue, by_node_id: bool = False,
+                     export_path: Optional[str] = None) -> None:
         """
-        with self.neo4j_client.driver.session() as session:
-            session.run("""
-                UNWIND $batch AS edge
-                MATCH (p1:Protein {id: edge.id1})
-                MATCH (p2:Protein {id: edge.id2})
-                CREATE (p1)-[:SIMILAR_TO {weight: edge.weight}]->(p2)
-            """, batch=batch)
+        Insert edge batches from the queue until a None arrives (one session per
+        thread), or append them to the export file.
         
-        self.stats['edges_created'] += len(batch)
+        After a failure (including opening the session) the remaining batches
+        are drained without being written, so the producer never blocks on a
+        full queue; the error is raised once the queue is closed.
+        """
+        error = None
+        closed = False
+        try:
+            with self._edge_sink(by_node_id, export_path) as write:
+                while not closed:
+                    batch = batches.get()
+                    closed = batch is None
+                    if not closed:
+                        write(batch)
+        except Exception as e:
+            error = e
+        while not closed:
+            closed = batches.get() is None
+        if error is not None:
+            raise error
+    
+    @contextmanager
+    def _edge_sink(self, by_node_id: bool, export_path: Optional[str]):
+        """
+        Yield the function a writer thread calls with each edge batch.
+        """
+        if export_path:
+            with open(export_path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(EDGES_HEADER)
+                
+                def write(batch):
+                    writer.writerows(zip(*(column.tolist() for column in batch)))
+                    with self._stats_lock:
+                        self.stats['edges_created'] += len(batch[2])
+                yield write
+        else:
+            with self.neo4j_client.session() as session:
+                yield lambda batch: self._create_edge_batch(batch, session, by_node_id)
+    
+    def _create_edge_batch(self, batch: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                           session: Session, by_node_id: bool = False) -> None:
+        """
+        Create a batch of similarity edges in Neo4j (one UNWIND query).
+        """
+        ids1, ids2, weights = (column.tolist() for column in batch)
+        self.neo4j_client.create_similarity_columns(
+            ids1, ids2, weights, batch_size=len(weights), session=session, by_node_id=by_node_id
+        )
+        with self._stats_lock:
+            self.stats['edges_created'] += len(weights)
     
     def create_indexes(self) -> None:
         """
@@ -233,14 +517,13 @@ class ProteinGraphBuilder:
         print("CREATING NEO4J INDEXES")
         print(f"{'='*60}\n")
         
-        with self.neo4j_client.driver.session() as session:
-            # Index on protein ID
-            session.run("CREATE INDEX protein_id IF NOT EXISTS FOR (p:Protein) ON (p.id)")
-            print("✓ Created index on protein ID")
-            
-            # Index on labeled status
-            session.run("CREATE INDEX protein_labeled IF NOT EXISTS FOR (p:Protein) ON (p.is_labeled)")
-            print("✓ Created index on labeled status")
+        self.neo4j_client.ensure_indexes()
+        print("✓ Created unique constraint on protein ID")
+        print("✓ Created index on labeled status")
+        print("✓ Created index on similarity weight")
+        print("✓ Created index on protein degree")
+        print("✓ Created full-text search index")
+        print("✓ Indexes online")
     
     def print_statistics(self) -> None:
         """
@@ -281,17 +564,26 @@ def main():
     
     # Get configuration from command line or environment
     similarity_threshold = float(os.getenv('SIMILARITY_THRESHOLD', '0.1'))
+    group_by = os.getenv('SIMILARITY_GROUP_BY') or None
+    export_dir = os.getenv('GRAPH_EXPORT_DIR') or None
+    # Load the exported files into the running Neo4j with LOAD CSV
+    load_csv = os.getenv('GRAPH_LOAD_CSV', 'false').lower() == 'true'
     protein_limit = os.getenv('PROTEIN_LIMIT', None)
     if protein_limit:
         protein_limit = int(protein_limit)
     
     print(f"Configuration:")
     print(f"  Similarity threshold: {similarity_threshold}")
+    print(f"  Compared within: {'same ' + group_by if group_by else 'all proteins'}")
     print(f"  Protein limit: {protein_limit if protein_limit else 'None (all proteins)'}\n")
     
+    if export_dir and not load_csv:
+        export_graph(mongo_uri, mongo_db, export_dir, similarity_threshold, group_by, protein_limit)
+        return
+    
     # Check if Neo4j already has data
     neo4j_client = Neo4jClient(neo4j_uri, neo4j_user, neo4j_pass)
-    with neo4j_client.driver.session() as session:
+    with neo4j_client.session() as session:
         result = session.run("MATCH (p:Protein) RETURN count(p) as count")
         existing_count = result.single()['count']
     
@@ -300,23 +592,35 @@ def main():
         print("\nOptions:")
         print("  1. Clear existing graph and rebuild (will delete everything)")
         print("  2. Skip building (keep existing graph)")
-        print("  3. Continue anyway (will create duplicates!)\n")
+        print("  3. Continue anyway (proteins are merged, SIMILAR_TO edges will be duplicated!)")
+        print("  4. Finish a bulk import (create indexes and degrees, keep the graph)\n")
         
         choice = os.getenv('RELOAD_MODE', '')
+        if not choice and not sys.stdin.isatty():
+            # No one to answer the prompt (pipeline, scheduler, CI)
+            print("ERROR: set RELOAD_MODE (1/2/3/4) to run without a terminal")
+            sys.exit(2)
         if not choice:
-            choice = input("Enter choice (1/2/3): ").strip()
+            choice = input("Enter choice (1/2/3/4): ").strip()
         
         if choice == '1':
             print("\nClearing existing graph...")
-            with neo4j_client.driver.session() as session:
+            with neo4j_client.session() as session:
                 session.run("MATCH (n) DETACH DELETE n")
             print("✓ Existing graph cleared\n")
         elif choice == '2':
             print("\n✓ Keeping existing graph. Exiting.\n")
             neo4j_client.close()
             sys.exit(0)
+        elif choice == '4':
+            ProteinGraphBuilder(None, neo4j_client).create_indexes()
+            neo4j_client.update_degrees()
+            bump_stats_version()
+            print("✓ Updated protein degrees\n")
+            neo4j_client.close()
+            sys.exit(0)
         else:
-            print("\n⚠ Continuing with existing graph (will create duplicates)...\n")
+            print("\n⚠ Continuing with existing graph (proteins are merged, SIMILAR_TO edges will be duplicated)...\n")
     
     neo4j_client.close()
     
@@ -346,7 +650,7 @@ def main():
     clear_graph = os.getenv('CLEAR_GRAPH', 'false').lower() == 'true'
     if clear_graph:
         print("Clearing existing graph...")
-        with neo4j_client.driver.session() as session:
+        with neo4j_client.session() as session:
             session.run("MATCH (n) DETACH DELETE n")
         print("✓ Graph cleared\n")
     
@@ -361,15 +665,31 @@ def main():
     # Step 2: Create indexes
     builder.create_indexes()
     
-    # Step 3: Create protein nodes
-    builder.create_protein_nodes(proteins)
-    
-    # Step 4: Create similarity edges
-    builder.create_similarity_edges(proteins)
+    if export_dir:
+        # Steps 3-4: write the import files, then have the server load them
+        # (the files must be in its import directory)
+        os.makedirs(export_dir, exist_ok=True)
+        builder.export_protein_nodes(proteins, export_dir)
+        builder.create_similarity_edges(
+            proteins, group_by=group_by, export_path=os.path.join(export_dir, EDGES_CSV)
+        )
+        print("\nLoading the files with LOAD CSV...")
+        neo4j_client.load_graph_csv(f'file:///{NODES_CSV}', f'file:///{EDGES_CSV}')
+        neo4j_client.update_degrees()
+        print("✓ Loaded nodes and edges, updated protein degrees")
+    else:
+        # Step 3: Create protein nodes
+        builder.create_protein_nodes(proteins)
+        
+        # Step 4: Create similarity edges
+        builder.create_similarity_edges(proteins, group_by=group_by)
     
     # Print final statistics
     builder.print_statistics()
     
+    # The API's graph statistics are stale from here on
+    bump_stats_version()
+    
     print("="*60)
     print("GRAPH CONSTRUCTION COMPLETE!")
     print("="*60 + "\n")
@@ -379,5 +699,46 @@ def main():
     neo4j_client.close()
 
 
+
+def export_graph(mongo_uri: str, mongo_db: str, directory: str, similarity_threshold: float,
+                 group_by: Optional[str], protein_limit: Optional[int]) -> None:
+    """
+    Write the graph as neo4j-admin import files instead of loading it over Bolt.
+    
+    An offline import skips transactions entirely, which is much faster for
+    millions of edges; Neo4j does not need to be running for the export.
+    """
+    mongo_client = MongoDBClient(mongo_uri, mongo_db)
+    if not mongo_client.check_connection():
+        print("ERROR: Cannot connect to MongoDB!")
+        sys.exit(1)
+    
+    builder = ProteinGraphBuilder(
+        mongo_client=mongo_client,
+        neo4j_client=None,
+        similarity_threshold=similarity_threshold
+    )
+    proteins = builder.load_proteins_from_mongodb(limit=protein_limit)
+    if not proteins:
+        print("ERROR: No proteins with domains found in MongoDB!")
+        print("Please run data_loader.py first to populate MongoDB.")
+        sys.exit(1)
+    
+    os.makedirs(directory, exist_ok=True)
+    builder.export_protein_nodes(proteins, directory)
+    builder.create_similarity_edges(
+        proteins, group_by=group_by, export_path=os.path.join(directory, EDGES_CSV)
+    )
+    builder.print_statistics()
+    mongo_client.close()
+    
+    print("Import the files with Neo4j stopped (this replaces the database), e.g.:")
+    print("  docker compose stop neo4j")
+    print("  docker compose run --rm neo4j neo4j-admin database import full --overwrite-destination \\")
+    print(f"    --nodes=Protein=/import/{NODES_CSV} --relationships=SIMILAR_TO=/import/{EDGES_CSV} neo4j")
+    print("  docker compose start neo4j")
+    print("then run this script again with RELOAD_MODE=4 to create the indexes and degrees.\n")
+
+
 if __name__ == '__main__':
     main()
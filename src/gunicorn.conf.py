@@ -0,0 +1,43 @@
+"""
+Gunicorn configuration for the protein API.
+
+Run from the repository root with:
+    gunicorn -c src/gunicorn.conf.py app:app
+"""
+import multiprocessing
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Threaded workers by default: every endpoint is database I/O, and both
+# drivers are thread-safe. GUNICORN_WORKER_CLASS=gevent switches to greenlets
+# (pymongo supports gevent; the Neo4j driver is not tested against it upstream)
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('GUNICORN_WORKERS', 2 * multiprocessing.cpu_count() + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+worker_tmp_dir = '/dev/shm'
+timeout = 60
+
+if worker_class == 'gevent':
+    # The gevent worker monkey-patches after fork; a preloaded app would have
+    # imported pymongo/neo4j with unpatched sockets and locks
+    preload_app = False
+    # Greenlets wait on the pool cheaply, so it need not match every connection
+    concurrency = min(worker_connections, 100)
+else:
+    preload_app = True
+    concurrency = threads
+
+# Each worker process owns its own connection pools: size them to the number
+# of concurrent requests plus the overview fan-out executor
+os.environ.setdefault('DB_POOL_SIZE', str(concurrency + 8))
+
+
+def post_fork(server, worker):
+    # Build this worker's own connection pools right after the fork, so the
+    # first request does not pay for it
+    from app import get_mongo, get_neo4j
+    get_mongo()
+    get_neo4j()
@@ -0,0 +1,54 @@
+import decimal
+import orjson
+from bson import Decimal128, ObjectId
+from flask.json.provider import JSONProvider
+from neo4j.time import Date, DateTime, Duration, Time
+
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def orjson_default(obj):
+    """
+    Fallback for types orjson does not serialize natively.
+    """
+    # Mongo documents are returned as-is: ObjectId _ids become hex strings here
+    # instead of being converted field by field in the views
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    # Bolt temporal values come back as neo4j.time types, not datetime
+    if isinstance(obj, (Date, DateTime, Time, Duration)):
+        return obj.iso_format()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj) -> bytes:
+    """
+    Serialize an object to JSON bytes with orjson.
+    """
+    return orjson.dumps(obj, default=orjson_default, option=ORJSON_OPTIONS)
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    orjson is implemented in C and returns bytes, so responses built by
+    jsonify() skip both the pure-Python encoder and the str -> utf-8 copy.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype='application/json')
@@ -1,9 +1,49 @@
+import heapq
 import os
 import sys
-from typing import Dict, List, Set, Tuple
-from collections import defaultdict, Counter
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+from neo4j import READ_ACCESS, Session
+from pymongo import UpdateOne
 from database.mongodb_client import MongoDBClient
 from database.neo4j_client import Neo4jClient
+from stats_version import bump_stats_version
+
+# Updates sent to MongoDB per bulk_write (one round-trip each)
+WRITE_BATCH_SIZE = 1000
+# Proteins updated per Neo4j write transaction
+NEO4J_BATCH_SIZE = 5000
+
+
+def compute_prediction(protein_id: str, confidences: List[Tuple[str, float]],
+                       confidence_threshold: float, max_labels: int) -> Optional[Dict]:
+    """
+    Prediction document for one protein from its (EC number, confidence)
+    votes, or None if no EC number reaches the threshold.
+    """
+    # Filter by confidence threshold and take the top N by confidence
+    # (partial heap selection rather than sorting every candidate)
+    top_labels = heapq.nlargest(
+        max_labels,
+        ((ec, conf) for ec, conf in confidences if conf >= confidence_threshold),
+        key=itemgetter(1)
+    )
+    
+    if not top_labels:
+        return None
+    
+    # The driver decodes a new string for every occurrence of an EC number;
+    # interning makes the predictions held for the write phase share one
+    # object per EC number (a vocabulary of a few thousand)
+    top_labels = [(sys.intern(ec), conf) for ec, conf in top_labels]
+    
+    return {
+        'protein_id': protein_id,
+        'predicted_ec_numbers': [ec for ec, _ in top_labels],
+        'confidence_scores': {ec: conf for ec, conf in top_labels},
+        'average_confidence': sum(conf for _, conf in top_labels) / len(top_labels)
+    }
 
 
 class LabelPropagation:
@@ -26,41 +66,43 @@ class LabelPropagation:
             'average_confidence': 0.0
         }
     
-    def get_neighbor_labels(self, protein_id: str, min_weight: float = 0.1) -> Dict[str, float]:
-        with self.neo4j_client.driver.session() as session:
-            result = session.run(
+    def get_neighbor_labels(self, protein_id: str, min_weight: float = 0.1,
+                            session: Optional[Session] = None) -> Dict[str, float]:
+        return self.get_neighbor_labels_batch([protein_id], min_weight, session).get(protein_id, {})
+    
+    def get_neighbor_labels_batch(self, protein_ids: List[str], min_weight: float = 0.1,
+                                  session: Optional[Session] = None) -> Dict[str, Dict[str, float]]:
+        """
+        EC confidence scores of several proteins in one round-trip: for each
+        protein with labeled neighbors, the share of the neighbor weight voting
+        for each EC number. Pass ids in chunks (e.g. 1000), and a session to
+        reuse across calls.
+        """
+        # Read sessions run managed read transactions: retried on transient
+        # errors and, on a cluster, routed to read replicas
+        with self.neo4j_client._read_session(session) as session:
+            result = session.execute_read(lambda tx: tx.run(
                 """
-                MATCH (p:Protein {id: $id})-[r:SIMILAR_TO]-(neighbor:Protein)
-                WHERE r.weight >= $min_weight 
+                UNWIND $ids AS id
+                MATCH (p:Protein {id: id})-[r:SIMILAR_TO]-(neighbor:Protein)
+                WHERE r.weight >= $min_weight
                   AND neighbor.is_labeled = true
                   AND size(neighbor.ec_numbers) > 0
-                RETURN neighbor.ec_numbers as ec_numbers, r.weight as weight
+                WITH id, sum(r.weight) AS total_weight,
+                     collect([neighbor.ec_numbers, r.weight]) AS votes
+                UNWIND votes AS vote
+                UNWIND vote[0] AS ec
+                WITH id, total_weight, ec, sum(vote[1]) AS ec_weight
+                RETURN id, collect([ec, ec_weight / total_weight]) AS confidences
                 """,
-                id=protein_id,
+                ids=protein_ids,
                 min_weight=min_weight
-            )
-            
-            # Collect weighted votes for each EC number
-            ec_votes = defaultdict(float)
-            total_weight = 0.0
-            
-            for record in result:
-                ec_numbers = record['ec_numbers']
-                weight = record['weight']
-                total_weight += weight
-                
-                for ec in ec_numbers:
-                    ec_votes[ec] += weight
-            
-            # Normalize by total weight to get confidence scores
-            if total_weight > 0:
-                ec_confidence = {
-                    ec: vote / total_weight
-                    for ec, vote in ec_votes.items()
-                }
-                return ec_confidence
-            
-            return {}
+            ).data())
+        
+        return {
+            record['id']: {ec: confidence for ec, confidence in record['confidences']}
+            for record in result
+        }
     
     def propagate_labels(self, confidence_threshold: float = 0.3,
                         min_edge_weight: float = 0.1,
@@ -73,61 +115,60 @@ class LabelPropagation:
         print(f"  Min edge weight: {min_edge_weight}")
         print(f"  Max labels per protein: {max_labels_per_protein}\n")
         
-        # Get all unlabeled proteins with labeled neighbors
-        with self.neo4j_client.driver.session() as session:
-            result = session.run(
+        # One aggregated query: for every unlabeled protein with labeled
+        # neighbors, the share of the neighbor weight voting for each EC number
+        # (rather than one round-trip per protein). The threshold and top-N
+        # are applied server-side, so only the kept EC numbers are returned
+        def read_votes(tx):
+            result = tx.run(
                 """
                 MATCH (unlabeled:Protein)-[r:SIMILAR_TO]-(labeled:Protein)
                 WHERE unlabeled.is_labeled = false
                   AND labeled.is_labeled = true
                   AND r.weight >= $min_weight
-                WITH DISTINCT unlabeled
-                RETURN unlabeled.id as protein_id
+                  AND size(labeled.ec_numbers) > 0
+                WITH unlabeled, sum(r.weight) AS total_weight,
+                     collect([labeled.ec_numbers, r.weight]) AS votes
+                UNWIND votes AS vote
+                UNWIND vote[0] AS ec
+                WITH unlabeled, total_weight, ec, sum(vote[1]) AS ec_weight
+                WITH unlabeled, ec, ec_weight / total_weight AS confidence
+                WHERE confidence >= $threshold
+                ORDER BY confidence DESC
+                RETURN unlabeled.id AS protein_id,
+                       collect([ec, confidence])[..$max_labels] AS confidences
                 """,
-                min_weight=min_edge_weight
+                min_weight=min_edge_weight,
+                threshold=confidence_threshold,
+                max_labels=max_labels_per_protein
             )
-            
-            unlabeled_proteins = [record['protein_id'] for record in result]
+            # Records are consumed as the driver fetches them (in pages of
+            # fetch_size) and reduced to predictions straight away, so the
+            # vote lists of every protein are never held at once. Built from
+            # scratch on each call, as the driver may retry the transaction
+            count = 0
+            predictions = []
+            for record in result:
+                count += 1
+                prediction = compute_prediction(
+                    record['protein_id'], record['confidences'],
+                    confidence_threshold, max_labels_per_protein
+                )
+                if prediction:
+                    predictions.append(prediction)
+            return count, predictions
         
-        print(f"Found {len(unlabeled_proteins):,} unlabeled proteins with labeled neighbors\n")
         print("Propagating labels...")
         
-        predictions = []
-        processed = 0
+        with self.neo4j_client.session(default_access_mode=READ_ACCESS) as session:
+            candidates, predictions = session.execute_read(read_votes)
         
-        for protein_id in unlabeled_proteins:
-            # Get neighbor labels with confidence scores
-            ec_confidence = self.get_neighbor_labels(protein_id, min_edge_weight)
-            
-            if ec_confidence:
-                # Filter by confidence threshold and limit
-                filtered_labels = {
-                    ec: conf for ec, conf in ec_confidence.items()
-                    if conf >= confidence_threshold
-                }
-                
-                # Sort by confidence and take top N
-                top_labels = sorted(
-                    filtered_labels.items(),
-                    key=lambda x: x[1],
-                    reverse=True
-                )[:max_labels_per_protein]
-                
-                if top_labels:
-                    prediction = {
-                        'protein_id': protein_id,
-                        'predicted_ec_numbers': [ec for ec, _ in top_labels],
-                        'confidence_scores': {ec: conf for ec, conf in top_labels},
-                        'average_confidence': sum(conf for _, conf in top_labels) / len(top_labels)
-                    }
-                    predictions.append(prediction)
-                    
-                    self.stats['proteins_annotated'] += 1
-                    self.stats['total_labels_propagated'] += len(top_labels)
-            
-            processed += 1
-            if processed % 100 == 0:
-                print(f"Processed {processed:,} / {len(unlabeled_proteins):,} proteins...")
+        print(f"Found {candidates:,} unlabeled proteins with confident labeled neighbors")
+        
+        self.stats['proteins_annotated'] += len(predictions)
+        self.stats['total_labels_propagated'] += sum(
+            len(prediction['predicted_ec_numbers']) for prediction in predictions
+        )
         
         print(f"\n✓ Label propagation complete!")
         print(f"  Proteins annotated: {self.stats['proteins_annotated']:,}")
@@ -154,15 +195,15 @@ class LabelPropagation:
         # Create index first (if not exists)
         predictions_collection.create_index('protein_id', unique=True)
         
-        # Use upsert to avoid duplicate key errors
+        # One bulk_write per batch
         upserted_count = 0
-        for pred in predictions:
-            predictions_collection.update_one(
-                {'protein_id': pred['protein_id']},
-                {'$set': pred},
-                upsert=True
-            )
-            upserted_count += 1
+        for start in range(0, len(predictions), WRITE_BATCH_SIZE):
+            ops = [
+                self._prediction_op(pred)
+                for pred in predictions[start:start + WRITE_BATCH_SIZE]
+            ]
+            predictions_collection.bulk_write(ops, ordered=False)
+            upserted_count += len(ops)
         
         print(f"✓ Saved {upserted_count:,} predictions to MongoDB")
     
@@ -178,20 +219,13 @@ class LabelPropagation:
         proteins_collection = self.mongo_client.db['proteins']
         updated_count = 0
         
-        for pred in predictions:
-            result = proteins_collection.update_one(
-                {'identifier': pred['protein_id']},
-                {
-                    '$set': {
-                        'predicted_ec_numbers': pred['predicted_ec_numbers'],
-                        'prediction_confidence': pred['confidence_scores'],
-                        'is_predicted': True,
-                        'average_prediction_confidence': pred['average_confidence']
-                    }
-                }
-            )
-            if result.modified_count > 0:
-                updated_count += 1
+        for start in range(0, len(predictions), WRITE_BATCH_SIZE):
+            ops = [
+                self._protein_op(pred)
+                for pred in predictions[start:start + WRITE_BATCH_SIZE]
+            ]
+            result = proteins_collection.bulk_write(ops, ordered=False)
+            updated_count += result.modified_count
         
         print(f"✓ Updated {updated_count:,} proteins in MongoDB with predictions")
     
@@ -204,44 +238,130 @@ class LabelPropagation:
             print("No predictions to update.")
             return
         
-        batch_size = 500
         batch = []
         
-        for pred in predictions:
-            batch.append({
-                'protein_id': pred['protein_id'],
-                'predicted_ec': pred['predicted_ec_numbers'],
-                'confidence': pred['confidence_scores']
-            })
+        # One session for every batch instead of one per batch
+        with self.neo4j_client.session() as session:
+            for pred in predictions:
+                batch.append(self._neo4j_row(pred))
+                
+                if len(batch) >= NEO4J_BATCH_SIZE:
+                    self._update_neo4j_batch(batch, session)
+                    batch = []
             
-            if len(batch) >= batch_size:
-                self._update_neo4j_batch(batch)
-                batch = []
-        
-        if batch:
-            self._update_neo4j_batch(batch)
+            if batch:
+                self._update_neo4j_batch(batch, session)
         
         print(f"✓ Updated {len(predictions):,} proteins in Neo4j")
     
-    def _update_neo4j_batch(self, batch: List[Dict]) -> None:
-        # Convert confidence dict to parallel lists for Neo4j storage
-        for item in batch:
-            confidence_dict = item['confidence']
-            # Create two parallel lists: EC numbers and their confidence scores
-            item['confidence_ec'] = list(confidence_dict.keys())
-            item['confidence_values'] = list(confidence_dict.values())
-        
-        with self.neo4j_client.driver.session() as session:
-            session.run(
-                """
-                UNWIND $batch AS item
-                MATCH (p:Protein {id: item.protein_id})
-                SET p.predicted_ec_numbers = item.predicted_ec,
-                    p.prediction_confidence_ec = item.confidence_ec,
-                    p.prediction_confidence_values = item.confidence_values
-                """,
-                batch=batch
+    def write_all(self, predictions: List[Dict]) -> None:
+        """
+        Save predictions to the predictions collection, the proteins collection
+        and Neo4j in one pass, flushing each batch as it fills up.
+        """
+        print(f"\n{'='*60}")
+        print("SAVING PREDICTIONS (MONGODB AND NEO4J)")
+        print(f"{'='*60}\n")
+        
+        if not predictions:
+            print("No predictions to save.")
+            return
+        
+        predictions_collection = self.mongo_client.db['predictions']
+        proteins_collection = self.mongo_client.db['proteins']
+        predictions_collection.create_index('protein_id', unique=True)
+        
+        prediction_ops, protein_ops, neo4j_batch = [], [], []
+        protein_results = []
+        
+        # The three targets are independent, so each full batch is written by
+        # a worker thread while the loop builds the next ones. Waiting for a
+        # target's previous write before submitting keeps one write in flight
+        # per target (the Neo4j session is never used by two threads at once)
+        # and re-raises its errors here
+        pending = {}
+        
+        def submit(target, fn, *args):
+            if target in pending:
+                pending[target].result()
+            pending[target] = pool.submit(fn, *args)
+            return pending[target]
+        
+        def flush_mongo():
+            submit('predictions', predictions_collection.bulk_write, prediction_ops, False)
+            protein_results.append(
+                submit('proteins', proteins_collection.bulk_write, protein_ops, False)
             )
+        
+        # The session is opened outside the pool: on error, the pool's exit
+        # waits for an in-flight Neo4j write before the session is closed
+        with self.neo4j_client.session() as session, ThreadPoolExecutor(max_workers=3) as pool:
+            for pred in predictions:
+                prediction_ops.append(self._prediction_op(pred))
+                protein_ops.append(self._protein_op(pred))
+                neo4j_batch.append(self._neo4j_row(pred))
+                
+                if len(prediction_ops) >= WRITE_BATCH_SIZE:
+                    flush_mongo()
+                    prediction_ops, protein_ops = [], []
+                if len(neo4j_batch) >= NEO4J_BATCH_SIZE:
+                    submit('neo4j', self._update_neo4j_batch, neo4j_batch, session)
+                    neo4j_batch = []
+            
+            if prediction_ops:
+                flush_mongo()
+            if neo4j_batch:
+                submit('neo4j', self._update_neo4j_batch, neo4j_batch, session)
+            for future in pending.values():
+                future.result()
+        
+        updated_count = sum(future.result().modified_count for future in protein_results)
+        
+        print(f"✓ Saved {len(predictions):,} predictions to MongoDB")
+        print(f"✓ Updated {updated_count:,} proteins in MongoDB with predictions")
+        print(f"✓ Updated {len(predictions):,} proteins in Neo4j")
+    
+    @staticmethod
+    def _prediction_op(pred: Dict) -> UpdateOne:
+        # Upsert to avoid duplicate key errors
+        return UpdateOne({'protein_id': pred['protein_id']}, {'$set': pred}, upsert=True)
+    
+    @staticmethod
+    def _protein_op(pred: Dict) -> UpdateOne:
+        return UpdateOne(
+            {'identifier': pred['protein_id']},
+            {
+                '$set': {
+                    'predicted_ec_numbers': pred['predicted_ec_numbers'],
+                    'prediction_confidence': pred['confidence_scores'],
+                    'is_predicted': True,
+                    'average_prediction_confidence': pred['average_confidence']
+                }
+            }
+        )
+    
+    @staticmethod
+    def _neo4j_row(pred: Dict) -> Dict:
+        # The confidence dict is stored as two parallel lists (EC numbers and
+        # their scores), already in predicted_ec order
+        return {
+            'protein_id': pred['protein_id'],
+            'predicted_ec': pred['predicted_ec_numbers'],
+            'confidence_ec': pred['predicted_ec_numbers'],
+            'confidence_values': list(pred['confidence_scores'].values())
+        }
+    
+    def _update_neo4j_batch(self, batch: List[Dict], session: Session) -> None:
+        session.execute_write(lambda tx: tx.run(
+            """
+            UNWIND $batch AS item
+            MATCH (p:Protein {id: item.protein_id})
+            SET p.predicted_ec_numbers = item.predicted_ec,
+                p.prediction_confidence_ec = item.confidence_ec,
+                p.prediction_confidence_values = item.confidence_values
+            """,
+            batch=batch
+        ).consume())
 
     def print_statistics(self) -> None:
         print(f"\n{'='*60}")
@@ -293,6 +413,10 @@ def main():
     
     print("✓ Database connections successful\n")
     
+    # The queries rely on the Protein.id, is_labeled and SIMILAR_TO.weight
+    # indexes (idempotent, and a no-op on a graph built by graph_builder.py)
+    neo4j_client.ensure_indexes()
+    
     # Initialize label propagation
     lp = LabelPropagation(mongo_client=mongo_client, neo4j_client=neo4j_client)
     
@@ -304,14 +428,13 @@ def main():
     )
     
     if predictions:
-        # Save predictions to MongoDB (separate collection)
-        lp.save_predictions_to_mongodb(predictions)
-        
-        # Update proteins collection with predictions
-        lp.update_proteins_with_predictions(predictions)
+        # Save predictions to MongoDB (separate collection), the proteins
+        # collection and Neo4j in a single pass over the predictions
+        lp.write_all(predictions)
         
-        # Update Neo4j with predictions
-        lp.update_neo4j_with_predictions(predictions)
+        # Predicted counts are part of the materialized statistics summary
+        mongo_client.refresh_statistics()
+        bump_stats_version()
         
         # Print statistics
         lp.print_statistics()
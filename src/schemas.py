@@ -0,0 +1,91 @@
+from functools import wraps
+from typing import List, Literal, Optional
+from flask import g, jsonify, request
+from pydantic import BaseModel, ValidationError, confloat, conint, conlist, constr, field_validator
+
+
+class SearchArgs(BaseModel):
+    q: constr(strip_whitespace=True, min_length=1)
+    limit: conint(gt=0, le=500) = 50
+
+
+class NeighborsArgs(BaseModel):
+    depth: conint(ge=1, le=2) = 1
+    min_weight: confloat(ge=0.0, le=1.0) = 0.0
+    limit: conint(gt=0, le=500) = 100
+
+
+class NeighborhoodArgs(BaseModel):
+    depth: conint(ge=1, le=2) = 2
+    min_weight: confloat(ge=0.0, le=1.0) = 0.1
+    limit: conint(gt=0, le=500) = 500
+    format: Literal['json', 'ndjson'] = 'json'
+
+
+class AdaptiveThresholdArgs(BaseModel):
+    target_neighbors: conint(gt=0, le=500) = 10
+    depth: conint(ge=1, le=2) = 1
+
+
+class PredictionsArgs(BaseModel):
+    limit: conint(gt=0, le=1000) = 20
+    after: Optional[str] = None
+
+
+class ProteinIdsArgs(BaseModel):
+    ids: conlist(str, min_length=1, max_length=500)
+    
+    @field_validator('ids', mode='before')
+    @classmethod
+    def split_ids(cls, value):
+        # ?ids=A,B,C -> ['A', 'B', 'C'], duplicates and blanks dropped
+        if isinstance(value, str):
+            return list(dict.fromkeys(part.strip() for part in value.split(',') if part.strip()))
+        return value
+
+
+class ProteinBatchBody(BaseModel):
+    ids: conlist(str, min_length=1, max_length=500)
+    sources: List[Literal['mongo', 'neo4j']] = ['mongo', 'neo4j']
+
+
+def _validation_error(message, error):
+    return jsonify({
+        'error': message,
+        'details': error.errors(include_url=False, include_context=False)
+    }), 400
+
+
+def validate_args(model):
+    """
+    Validate and coerce the query string with a pydantic model before the view runs.
+    
+    The parsed model is stored in g.args; invalid parameters short-circuit with a
+    400 response without touching the databases.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                g.args = model.model_validate(request.args.to_dict())
+            except ValidationError as e:
+                return _validation_error('Invalid query parameters', e)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def validate_json(model):
+    """
+    Same as validate_args for JSON request bodies; the parsed model is stored in g.body.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                g.body = model.model_validate(request.get_json(silent=True) or {})
+            except ValidationError as e:
+                return _validation_error('Invalid request body', e)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,43 @@
+"""
+Request coalescing for expensive database calls
+"""
+from concurrent.futures import Future
+import threading
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time.
+
+    The first caller for a key executes the function; callers arriving while
+    it is in flight wait for the same result (or exception) instead of
+    issuing their own query. Nothing is kept once the call completes, so
+    this only protects the cache-miss path and never serves stale data.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
@@ -0,0 +1,45 @@
+"""
+Version of the statistics served by the API
+
+The API uses it as the ETag of the statistics endpoints and in their cache
+keys, so publishing a new version after the data changes (ingest, graph
+build, label propagation, summary refresh) invalidates both.
+"""
+import os
+import time
+
+import redis
+
+# The API's flask-caching prefix and key: the version is shared through the
+# same Redis the response cache uses
+CACHE_KEY_PREFIX = 'proteins_'
+STATS_VERSION_KEY = 'stats_version'
+
+
+def new_stats_version() -> int:
+    """
+    Millisecond timestamp: never reused, even after the cache is cleared, and
+    stored by flask-caching as a plain integer that scripts can write directly.
+    """
+    return time.time_ns() // 1_000_000
+
+
+def bump_stats_version() -> None:
+    """
+    Publish a new version from a script or worker (no-op without REDIS_HOST).
+    """
+    host = os.getenv('REDIS_HOST')
+    if not host:
+        return
+
+    try:
+        client = redis.Redis(
+            host=host,
+            port=int(os.getenv('REDIS_PORT', 6379)),
+            socket_connect_timeout=2
+        )
+        client.set(CACHE_KEY_PREFIX + STATS_VERSION_KEY, new_stats_version())
+    except Exception as e:
+        # The data is written either way; the API serves the old figures
+        # until their cache entries expire
+        print(f"Could not publish the statistics version: {e}")
@@ -0,0 +1,103 @@
+"""
+Background jobs for long-running queries (Celery, Redis broker)
+
+Run a worker (with the embedded beat scheduler for periodic jobs) with:
+    celery -A tasks worker -B --loglevel=info
+"""
+from celery import Celery
+from database.mongodb_client import MongoDBClient
+from database.neo4j_client import Neo4jClient
+from json_provider import dumps_bytes
+from stats_version import bump_stats_version
+from kombu.serialization import register
+import orjson
+import os
+
+REDIS_URL = f"redis://{os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', 6379)}"
+
+# Messages and results are encoded with orjson (the encoder behind the API's
+# JSON responses): large neighborhood payloads are serialized in C, and
+# EdgeRow dataclasses need no conversion to dicts first
+register(
+    'orjson',
+    dumps_bytes,
+    orjson.loads,
+    content_type='application/x-orjson',
+    content_encoding='binary'
+)
+
+# Queued jobs and results belong on a Redis that never evicts keys and
+# persists them (the broker service): the response cache instance evicts under
+# memory pressure and keeps nothing across restarts. The defaults only suit
+# local development
+celery = Celery(
+    'proteins',
+    broker=os.getenv('CELERY_BROKER_URL', f'{REDIS_URL}/1'),
+    backend=os.getenv('CELERY_RESULT_BACKEND', f'{REDIS_URL}/2')
+)
+celery.conf.update(
+    task_serializer='orjson',
+    result_serializer='orjson',
+    accept_content=['orjson', 'json'],
+    task_track_started=True,
+    # Queries are read-only, so a job lost with its worker can safely run again
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    task_time_limit=int(os.getenv('JOB_TIME_LIMIT', 300)),
+    result_expires=int(os.getenv('JOB_RESULT_TTL', 3600)),
+    # Fail fast in the API when Redis is down instead of blocking the request
+    # (the default policies retry for ~20 seconds)
+    broker_connection_timeout=2,
+    task_publish_retry=False,
+    result_backend_transport_options={'retry_policy': {'max_retries': 2}},
+    beat_schedule={
+        'refresh-statistics': {
+            'task': 'proteins.refresh_statistics',
+            'schedule': float(os.getenv('STATS_REFRESH_INTERVAL', 600))
+        }
+    }
+)
+
+# One client per worker process, created on first task
+_mongo = None
+_neo4j = None
+
+def get_mongo():
+    global _mongo
+    if _mongo is None:
+        _mongo = MongoDBClient(
+            uri=os.getenv('MONGO_URI'),
+            db_name=os.getenv('MONGO_DB_NAME', 'protein_db')
+        )
+    return _mongo
+
+def get_neo4j():
+    global _neo4j
+    if _neo4j is None:
+        _neo4j = Neo4jClient(
+            uri=os.getenv('NEO4J_URI'),
+            username=os.getenv('NEO4J_USERNAME'),
+            password=os.getenv('NEO4J_PASSWORD'),
+            fetch_size=int(os.getenv('NEO4J_FETCH_SIZE', 1000)),
+            database=os.getenv('NEO4J_DATABASE', 'neo4j')
+        )
+    return _neo4j
+
+
+@celery.task(name='proteins.compute_neighborhood')
+def compute_neighborhood(protein_id, depth=2, min_weight=0.1, limit=500):
+    """Neighborhood visualization payload, or None if the protein is not in the graph."""
+    return get_neo4j().get_neighborhood_visualization(
+        protein_id=protein_id,
+        depth=depth,
+        min_weight=min_weight,
+        limit=limit
+    )
+
+
+@celery.task(name='proteins.refresh_statistics', ignore_result=True)
+def refresh_statistics():
+    """Recompute the materialized MongoDB statistics summary."""
+    get_mongo().refresh_statistics()
+    # The API serves the new figures (and new ETags) right away
+    bump_stats_version()